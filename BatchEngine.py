@@ -0,0 +1,308 @@
+# Python 3.6
+# rules: https://web.archive.org/web/20181019011459/http://www.halite.io/learn-programming-challenge/game-overview
+
+'''Many single-bot Halite games stepped at once as stacked NumPy arrays, for parameter sweeps.
+
+BatchMatch holds N games: (N, height, width) halite and padded (N, max ships) ship tables. Its step applies move costs, movement,
+spawning, collisions, mining and deposits to every game in one go, following LocalEngine.Match's rules. Each game is FlinkBot
+against an EmptyBot: the opponent's shipyard is on the map, but it never has ships, so nothing is ever inspired.
+
+FlinkPolicy is FlinkBot's heuristic over a whole batch of personality vectors (-p): ships claim the nearest unclaimed cell with at
+least q[0] halite, head home when full (or over q[1] on a drained cell), and greedily take the free neighbouring cell that brings
+them closest to their target. It is an approximation: ships returning home go the short way rather than along FlinkBot's cheapest
+path, and moves are settled ship by ship rather than by hlt.assignment's optimal matching. Use it to screen parameters, and
+LocalEngine to measure the bot itself.
+
+Usage: python BatchEngine.py [--width 32] [--height 32] [--seed N] [--games 64]
+'''
+
+import argparse
+import time
+from collections import namedtuple
+
+import numpy as np
+
+from LocalEngine import DEFAULT_CONSTANTS, generate_map, max_turns
+
+# Direction codes used in the move arrays, in the order of their offsets
+NORTH, SOUTH, EAST, WEST, STILL = range(5)
+OFFSETS = np.array([(0, -1), (0, 1), (1, 0), (-1, 0), (0, 0)])
+
+BatchResult = namedtuple('BatchResult', ['seeds', 'width', 'height', 'turns', 'scores', 'history', 'collisions'])
+BatchResult.__doc__ = '''The outcome of a batch of games.
+
+scores: (games,) final stored halite. history: (turns, games) stored halite after each turn. collisions: (games,) ships destroyed.'''
+
+
+class BatchMatch:
+    '''The state of N single-bot games on maps of one size, advanced a turn at a time by step().'''
+    def __init__(self, seeds, width=32, height=32, constants=None, max_ships=32):
+        '''
+        :param seeds: One map seed per game (games may share a seed to compare parameters on the same map)
+        :param constants: Overrides for LocalEngine.DEFAULT_CONSTANTS (engine names, e.g. {'MAX_TURNS': 100})
+        :param max_ships: Ship slots per game. A spawn with no free slot is refused.
+        '''
+        self.seeds = list(seeds)
+        self.width = width
+        self.height = height
+        self.constants = dict(DEFAULT_CONSTANTS, MAX_TURNS=max_turns(width, height))
+        self.constants.update(constants or {})
+        maps = [generate_map(width, height, 2, seed) for seed in self.seeds]
+        games = len(self.seeds)
+        self.halite = np.stack([halite for halite, _ in maps]).reshape(games, -1)
+        # Player 0's shipyard, as a flat cell index; the opponent's is only ever an empty structure
+        self.shipyard = np.array([y * width + x for _, ((x, y), _) in maps])
+        self.energy = np.full(games, self.constants['INITIAL_ENERGY'], dtype=np.int64)
+        self.alive = np.zeros((games, max_ships), dtype=bool)
+        self.cell = np.zeros((games, max_ships), dtype=np.int64)
+        self.cargo = np.zeros((games, max_ships), dtype=np.int64)
+        self.collisions = np.zeros(games, dtype=np.int64)
+        self.turn_number = 0
+        self.history = []
+
+        cells = np.arange(width * height)
+        self.cell_x = cells % width
+        self.cell_y = cells // width
+        # neighbours[cell, direction]: the cell reached by moving that way
+        xs = (self.cell_x[:, None] + OFFSETS[:, 0]) % width
+        ys = (self.cell_y[:, None] + OFFSETS[:, 1]) % height
+        self.neighbours = ys * width + xs
+        # cell_distance[a, b]: Manhattan distance the short way around the map, computed once and gathered from every turn
+        dx = np.abs(self.cell_x[:, None] - self.cell_x[None, :])
+        dy = np.abs(self.cell_y[:, None] - self.cell_y[None, :])
+        self.cell_distance = (np.minimum(dx, width - dx) + np.minimum(dy, height - dy)).astype(np.int16)
+
+    @property
+    def games(self):
+        return len(self.seeds)
+
+    @property
+    def finished(self):
+        '''Whether every turn has been played.'''
+        return self.turn_number >= self.constants['MAX_TURNS']
+
+    def distances(self, cells, targets):
+        '''Manhattan distances the short way around the map between flat cell indices (broadcast together).'''
+        return self.cell_distance[cells, targets]
+
+    def step(self, moves, spawn):
+        '''Play one turn of every game.
+
+        :param moves: (games, max ships) direction codes (NORTH ... STILL). Entries for empty slots are ignored.
+        :param spawn: (games,) whether each game builds a ship at its shipyard
+        '''
+        c = self.constants
+        rows = np.arange(self.games)[:, None]
+        moves = np.where(self.alive, moves, STILL)
+
+        # Moves: a ship that cannot pay to leave its cell stays (and mines)
+        cost = self.halite[rows, self.cell] // c['MOVE_COST_RATIO']
+        stayed = (moves == STILL) | (self.cargo < cost)
+        self.cargo -= np.where(stayed, 0, cost)
+        self.cell = np.where(stayed, self.cell, self.neighbours[self.cell, moves])
+
+        spawning = spawn & (self.energy >= c['NEW_ENTITY_ENERGY_COST']) & ~self.alive.all(axis=1)
+        slot = np.argmin(self.alive, axis=1)
+        games = np.flatnonzero(spawning)
+        self.energy[games] -= c['NEW_ENTITY_ENERGY_COST']
+        self.alive[games, slot[games]] = True
+        self.cell[games, slot[games]] = self.shipyard[games]
+        self.cargo[games, slot[games]] = 0
+        stayed[games, slot[games]] = False
+
+        # Collisions: every ship on a shared cell is destroyed, and its cargo goes to the cell (or the shipyard's owner)
+        cells = self.halite.shape[1]
+        keys = np.where(self.alive, rows * cells + self.cell, -1)
+        live_keys = keys[self.alive]
+        counts = np.bincount(live_keys, minlength=self.games * cells)
+        crashed = self.alive & (counts[np.maximum(keys, 0)] > 1)
+        if crashed.any():
+            game, ship = np.nonzero(crashed)
+            at_shipyard = self.cell[game, ship] == self.shipyard[game]
+            np.add.at(self.energy, game[at_shipyard], self.cargo[game, ship][at_shipyard])
+            np.add.at(self.halite, (game[~at_shipyard], self.cell[game, ship][~at_shipyard]), self.cargo[game, ship][~at_shipyard])
+            self.collisions += crashed.sum(axis=1)
+            self.alive &= ~crashed
+            self.cargo[crashed] = 0
+
+        # Mining by ships that stayed put, then deposits at the shipyard
+        home = self.alive & (self.cell == self.shipyard[:, None])
+        self.energy += np.where(home, self.cargo, 0).sum(axis=1)
+        self.cargo[home] = 0
+        mining = self.alive & stayed & ~home
+        cell_halite = self.halite[rows, self.cell]
+        extracted = np.minimum(-(-cell_halite // c['EXTRACT_RATIO']), c['MAX_ENERGY'] - self.cargo)
+        extracted = np.where(mining, extracted, 0)
+        self.cargo += extracted
+        # Empty slots may point at a live ship's cell, so subtract unbuffered rather than assign
+        np.subtract.at(self.halite, (np.broadcast_to(rows, self.cell.shape), self.cell), extracted)
+
+        self.turn_number += 1
+        self.history.append(self.energy.copy())
+
+    def result(self):
+        '''The batch's outcome so far, as a BatchResult.'''
+        history = np.array(self.history).reshape(-1, self.games)
+        return BatchResult(self.seeds, self.width, self.height, self.turn_number, self.energy.copy(), history,
+                           self.collisions.copy())
+
+
+class FlinkPolicy:
+    '''FlinkBot's targeting and greedy moves for every game of a BatchMatch, each game with its own personality vector.'''
+    def __init__(self, params, constants=None):
+        '''
+        :param params: (games, 3) personality parameters between 0 and 1, as MyBot's -p
+        :param constants: Overrides for LocalEngine.DEFAULT_CONSTANTS, as given to BatchMatch
+        '''
+        constants = dict(DEFAULT_CONSTANTS, **(constants or {}))
+        params = np.asarray(params, dtype=float).reshape(-1, 3)
+        # As FlinkBot.start_game: depleted-cell threshold, cargo to head home with, most ships to build
+        self.depleted = params[:, 0] * 200
+        self.returning = (0.5 + params[:, 1] * 0.25) * constants['MAX_ENERGY']
+        self.max_ships = 1 + np.round(params[:, 2] * 29).astype(int)
+
+    def ship_slots(self):
+        '''Slots a BatchMatch needs for these parameters: FlinkBot spawns while it has at most max_ships ships.'''
+        return int(self.max_ships.max()) + 1
+
+    def targets(self, match):
+        '''Each ship's target cell: the shipyard when returning, else the nearest unclaimed cell with at least the depleted threshold.
+
+        Ships nearest to rich halite claim first, as in FlinkBot.rank_moves. Once a game's rich cells are all claimed, its
+        remaining ships share them; with no rich cells at all they stay put.'''
+        games, slots = match.alive.shape
+        rows = np.arange(games)
+        cell_halite = match.halite[rows[:, None], match.cell]
+        returning = match.alive & ((match.cargo >= match.constants['MAX_ENERGY']) |
+                                   ((match.cargo > self.returning[:, None]) & (cell_halite < self.depleted[:, None])))
+        rich = match.halite >= self.depleted[:, None]
+        rich[rows, match.shipyard] = False
+
+        # (games, slots, cells) distances from every ship to every cell
+        distance = match.cell_distance[match.cell]
+        far = np.iinfo(distance.dtype).max
+        to_rich = np.where(rich[:, None, :], distance, far).min(axis=2)
+        order = np.argsort(np.where(match.alive, to_rich, far), axis=1, kind='stable')
+
+        targets = match.cell.copy()
+        targets[returning] = np.broadcast_to(match.shipyard[:, None], targets.shape)[returning]
+        unclaimed = rich.copy()
+        for rank in range(slots):
+            ship = order[:, rank]
+            seeking = match.alive[rows, ship] & ~returning[rows, ship] & rich.any(axis=1)
+            if not seeking.any():
+                continue
+            free = np.where(unclaimed.any(axis=1)[:, None], unclaimed, rich)
+            choice = np.argmin(np.where(free, distance[rows, ship], far), axis=1)
+            targets[rows[seeking], ship[seeking]] = choice[seeking]
+            unclaimed[rows[seeking], choice[seeking]] = False
+        return targets
+
+    def commands(self, match):
+        '''The moves and spawns for one turn of every game, as BatchMatch.step takes them.
+
+        Ships that are on their target, or carry less than a tenth of their cell's halite, stay. The others take the free
+        neighbouring cell that brings them closest to their target (ships on the shipyard take any free cell), in the order
+        targets were claimed. A ship never moves onto a cell another ship has taken or has yet to leave, so there are no collisions.'''
+        games, slots = match.alive.shape
+        rows = np.arange(games)
+        targets = self.targets(match)
+        cell_halite = match.halite[rows[:, None], match.cell]
+        staying = ~match.alive | (match.cell == targets) | (match.cargo < cell_halite * 0.1)
+
+        # Squared distance to the target from each neighbour (games, slots, direction), as FlinkBot's dist_betw_positions
+        neighbours = match.neighbours[match.cell]
+        dx = np.abs(match.cell_x[neighbours] - match.cell_x[targets][:, :, None])
+        dy = np.abs(match.cell_y[neighbours] - match.cell_y[targets][:, :, None])
+        score = np.minimum(dx, match.width - dx) ** 2 + np.minimum(dy, match.height - dy) ** 2
+        on_shipyard = (match.cell == match.shipyard[:, None])[:, :, None]
+        better = (score < score[:, :, STILL:]) | on_shipyard
+        better[:, :, STILL] = True
+        score = np.where(better, score, np.iinfo(np.int64).max)
+        score[:, :, STILL] = np.iinfo(np.int64).max  # staying is always the last choice
+        preference = np.argsort(score, axis=2, kind='stable')
+
+        cells = match.halite.shape[1]
+        # holder: the slot of the ship on each cell that has yet to move (-1 if none). committed: cells ships will end the turn on.
+        holder = np.full((games, cells), -1)
+        game, slot = np.nonzero(match.alive)
+        holder[game, match.cell[game, slot]] = slot
+        committed = np.zeros((games, cells), dtype=bool)
+        done = ~match.alive
+        first = preference[:, :, 0]
+        first_move = (~staying & better[rows[:, None], np.arange(slots), first]) & (first != STILL)
+        first_destination = np.take_along_axis(neighbours, first[:, :, None], axis=2)[:, :, 0]
+        moves = np.full((games, slots), STILL)
+        far = np.iinfo(match.cell_distance.dtype).max
+        order = np.argsort(np.where(match.alive, match.distances(match.cell, targets), far), axis=1, kind='stable')
+        for rank in range(slots):
+            ship = order[:, rank]
+            active = ~done[rows, ship]
+            if not active.any():
+                continue
+            here = match.cell[rows, ship]
+            choice = np.full(games, STILL)
+            partner = np.full(games, -1)
+            undecided = active & ~staying[rows, ship]
+            for option in range(STILL):
+                direction = preference[rows, ship, option]
+                destination = neighbours[rows, ship, direction]
+                occupant = holder[rows, destination]
+                # A ship that has yet to move can be swapped with, if its own first choice is this ship's cell
+                other = np.maximum(occupant, 0)
+                swap = (occupant >= 0) & first_move[rows, other] & (first_destination[rows, other] == here)
+                free = ~committed[rows, destination] & ((occupant < 0) | swap)
+                take = undecided & (direction != STILL) & better[rows, ship, direction] & free
+                choice[take] = direction[take]
+                partner[take & swap] = occupant[take & swap]
+                undecided &= ~take
+            destination = neighbours[rows, ship, choice]
+            moves[rows[active], ship[active]] = choice[active]
+            committed[rows[active], destination[active]] = True
+            holder[rows[active], here[active]] = -1
+            done[rows[active], ship[active]] = True
+
+            swapped = np.flatnonzero(partner >= 0)
+            other = partner[swapped]
+            moves[swapped, other] = first[swapped, other]
+            committed[swapped, here[swapped]] = True
+            holder[swapped, match.cell[swapped, other]] = -1
+            done[swapped, other] = True
+
+        ship_count = match.alive.sum(axis=1)
+        spawn = ~committed[rows, match.shipyard] & (ship_count <= self.max_ships) & \
+            (match.energy >= match.constants['NEW_ENTITY_ENERGY_COST'])
+        return moves, spawn
+
+
+def run_batch(params, seeds, width=32, height=32, constants=None):
+    '''Play FlinkPolicy with each personality vector against an idle opponent, all games at once.
+
+    :param params: (games, 3) personality parameters, one row per game
+    :param seeds: A map seed per game, or a single seed for every game
+    :return: A BatchResult
+    '''
+    params = np.asarray(params, dtype=float).reshape(-1, 3)
+    if np.isscalar(seeds):
+        seeds = [seeds] * len(params)
+    policy = FlinkPolicy(params, constants)
+    match = BatchMatch(seeds, width, height, constants, max_ships=policy.ship_slots())
+    while not match.finished:
+        match.step(*policy.commands(match))
+    return match.result()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Batched FlinkBot simulation over random personality vectors')
+    parser.add_argument('--width', type=int, default=32)
+    parser.add_argument('--height', type=int, default=32)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--games', type=int, default=64)
+    cli_args = parser.parse_args()
+
+    params = np.random.RandomState(cli_args.seed).random_sample((cli_args.games, 3))
+    start = time.time()
+    result = run_batch(params, cli_args.seed, cli_args.width, cli_args.height)
+    print(f"{cli_args.games} games in {time.time() - start:.1f}s")
+    for score, p in sorted(zip(result.history.max(axis=0).tolist(), params.tolist()), reverse=True)[:10]:
+        print(score, [round(value, 3) for value in p])
@@ -1,6 +1,8 @@
 import numpy as np
 import matplotlib.pyplot as plt
 import itertools
+import functools
+import math
 from typing import Callable
 
 # https://newton.cx/~peter/2014/03/elementary-gaussian-processes-in-python/
@@ -25,27 +27,174 @@ class EGO():
 
         if thetas is None:
             thetas = tuple(1 for _ in range(num_fields))
-
-        if num_fields > 1:
-            # delta_f is the distance between two multi-dimensional points
-            #         = sqrt(delta_x1**2 + delta_x2**2 + ...)
-            # We also adjust by that dimension's theta. Larger thetas mean the difference matters more.
-            def delta_f(x1, x2):
-                sum_of_sq = 0
-                for i, theta in zip(range(num_fields), thetas):
-                    sum_of_sq += ((x1[np.newaxis,:,i] - x2[i,:, np.newaxis]) * theta)**2 
-                return np.sqrt(sum_of_sq)
-            self.delta_f = delta_f
-        else:
-            # with only one dimension, we can skip the sqrt and **, since they cancel.
-            self.delta_f = lambda x1, x2: x1[np.newaxis,:,0] - x2[0,:, np.newaxis]
-
-        self.x = np.empty((0, num_fields))
-        self.y = np.empty((0))
+        self.thetas = np.asarray(thetas, dtype=float)
+
+        # Observations and the Cholesky factor of their covariance live in buffers that double in size when full,
+        # so adding a point neither copies the history nor refactors the covariance.
+        self.n = 0
+        self._x = np.empty((16, num_fields))
+        self._y = np.empty(16)
+        self._chol = np.zeros((16, 16))
+
+    def delta_f(self, x1, x2):
+        '''Return r[i,j], the distance from x1[j] to x2[:,i] after scaling each dimension by its theta.
+           shape of x1: m, num_fields. shape of x2: num_fields, n (i.e. transposed). shape of r: n, m.
+           Larger thetas mean the difference matters more.'''
+        # sqrt(sum((theta * (a - b))**2)) for every pair, expanded as |a|^2 + |b|^2 - 2 a.b so all
+        # dimensions go through one matrix product instead of one (n, m) temporary per dimension.
+        a = x1 * self.thetas # shape: m, num_fields
+        b = np.transpose(x2) * self.thetas # shape: n, num_fields
+        sq = np.dot(b, a.T)
+        sq *= -2
+        sq += np.einsum('ij,ij->i', b, b)[:, np.newaxis]
+        sq += np.einsum('ij,ij->i', a, a)[np.newaxis, :]
+        # Rounding can leave identical points very slightly negative
+        np.maximum(sq, 0, out=sq)
+        return np.sqrt(sq, out=sq)
+
+    @property
+    def x(self):
+        '''The points added so far, shape (n, num_fields).'''
+        return self._x[:self.n]
+
+    @property
+    def y(self):
+        '''The values added so far, shape (n).'''
+        return self._y[:self.n]
+
+    @property
+    def chol(self):
+        '''Lower-triangular L with L @ L.T == gp_cov(self.x, self.predicted_noise).'''
+        return self._chol[:self.n, :self.n]
+
+    def _grow(self):
+        capacity = 2 * len(self._y)
+        x, y, chol = self._x, self._y, self._chol
+        self._x = np.empty((capacity, self.num_fields))
+        self._y = np.empty(capacity)
+        self._chol = np.zeros((capacity, capacity))
+        self._x[:self.n] = x[:self.n]
+        self._y[:self.n] = y[:self.n]
+        self._chol[:self.n, :self.n] = chol[:self.n, :self.n]
 
     def add_point(self, y:float, x):
-        self.x = np.vstack((self.x, x))
-        self.y = np.append(self.y, y)
+        '''Add an observation, extending the Cholesky factor by one row in O(n^2).'''
+        self._extend(y, x, self.predicted_noise)
+
+    def _extend(self, y, x, noise):
+        '''add_point with the noise at this point given, so made-up points can be added exactly (see propose_batch).'''
+        x = np.asarray(x, dtype=float).reshape(self.num_fields)
+        if self.n == len(self._y):
+            self._grow()
+        n = self.n
+        # Covariance of the new point with the existing ones, and with itself
+        k = self.kernel(self.delta_f(x[np.newaxis, :], np.transpose(self.x)))[:, 0] # shape: n
+        kappa = self.kernel(0) + noise
+        row = solve_triangular(self.chol, k)
+        # A repeated point with no noise would make the covariance singular; keep the factor just positive-definite.
+        pivot = max(kappa - np.dot(row, row), 1e-12 * kappa)
+
+        self._chol[n, :n] = row
+        self._chol[n, n] = np.sqrt(pivot)
+        self._x[n] = x
+        self._y[n] = y
+        self.n = n + 1
+
+    def _refactor(self):
+        '''Recompute the Cholesky factor from scratch, after the kernel, thetas or noise change.'''
+        if self.n:
+            self._chol[:self.n, :self.n] = np.linalg.cholesky(self.gp_cov(self.x, self.predicted_noise))
+
+    def _standardized_y(self):
+        '''The y values shifted to mean 0 and scaled to variance 1, the units the kernel and noise are in.'''
+        y = self.y - np.average(self.y)
+        std_y = np.std(self.y)
+        return y / std_y if std_y > 0 else y
+
+    def log_marginal_likelihood(self):
+        '''Return the log marginal likelihood of the standardized y values under the current kernel, thetas
+           and noise. Uses the kept Cholesky factor, so costs only two triangular solves.'''
+        y = self._standardized_y()
+        z = solve_triangular(self.chol, y)
+        return -0.5 * np.dot(z, z) - np.sum(np.log(np.diag(self.chol))) - 0.5 * self.n * np.log(2 * np.pi)
+
+    def _sqexp_likelihood(self, log_params, sq_dists, y, gradient=True):
+        '''Return the log marginal likelihood of y under a square-exponent kernel, and its gradient (or None).
+           log_params: the logs of the signal variance, each dimension's theta, and the noise.
+           sq_dists: shape num_fields, n, n - the squared separation of the points along each dimension.'''
+        signal = np.exp(log_params[0])
+        thetas_sq = np.exp(2 * log_params[1:-1])
+        noise = np.exp(log_params[-1])
+        k_signal = signal * np.exp(-0.5 * np.tensordot(thetas_sq, sq_dists, axes=1)) # shape: n, n
+        try:
+            chol = np.linalg.cholesky(k_signal + noise * np.eye(len(y)))
+        except np.linalg.LinAlgError:
+            return -np.inf, None
+        alpha = solve_triangular(chol, solve_triangular(chol, y), transpose=True) # inv(cov) @ y
+        value = -0.5 * np.dot(y, alpha) - np.sum(np.log(np.diag(chol))) - 0.5 * len(y) * np.log(2 * np.pi)
+        if not gradient:
+            return value, None
+
+        # d(value)/d(param) = 0.5 * sum((alpha alpha^T - inv(cov)) * d(cov)/d(param)), where
+        # d(cov)/d(log signal) = k_signal, d(cov)/d(log theta_d) = -theta_d^2 * sq_dists[d] * k_signal, d(cov)/d(log noise) = noise * I
+        chol_inv = solve_triangular(chol, np.eye(len(y)))
+        inner = np.outer(alpha, alpha) - np.dot(chol_inv.T, chol_inv)
+        weighted = inner * k_signal
+        grad = np.empty_like(log_params)
+        grad[0] = 0.5 * np.sum(weighted)
+        grad[1:-1] = -0.5 * thetas_sq * np.tensordot(sq_dists, weighted, axes=([1, 2], [0, 1]))
+        grad[-1] = 0.5 * noise * np.trace(inner)
+        return value, grad
+
+    def _ascend(self, log_params, sq_dists, y, low, high, iterations):
+        '''Gradient ascent on _sqexp_likelihood within [low, high]. The step grows while the likelihood improves and halves when it does not.
+           Returns the best (value, log_params) found.'''
+        value, grad = self._sqexp_likelihood(log_params, sq_dists, y)
+        step = 0.1
+        for _ in range(iterations):
+            if grad is None or step < 1e-6:
+                break
+            candidate = np.clip(log_params + step * grad / max(np.linalg.norm(grad), 1e-12), low, high)
+            candidate_value, candidate_grad = self._sqexp_likelihood(candidate, sq_dists, y)
+            if candidate_value > value:
+                log_params, value, grad = candidate, candidate_value, candidate_grad
+                step *= 1.5
+            else:
+                step *= 0.5
+        return value, log_params
+
+    def fit(self, starts:int=3, candidates:int=32, iterations:int=200, rng=None):
+        '''Fit a square-exponent kernel to the points added so far by maximizing the log marginal likelihood of the
+           standardized y values: the signal variance, each dimension's theta, and the noise.
+           candidates random hyperparameter sets (plus the current ones, if the kernel is a square-exponent one) are scored,
+           and the best starts of them are refined by gradient ascent.
+           The kernel, thetas and predicted_noise are replaced only if the fit beats the current model.
+           Returns the resulting log marginal likelihood, or None with fewer than 2 points.'''
+        if self.n < 2:
+            return None
+        rng = rng if rng is not None else np.random
+        y = self._standardized_y()
+        x = self.x
+        sq_dists = (x.T[:, :, np.newaxis] - x.T[:, np.newaxis, :])**2 # shape: num_fields, n, n
+
+        # Searched within: signal variance 0.01 to 100, thetas 0.01 to 1000, noise 1e-6 to 10 (relative to the variance of y)
+        low = np.log(np.array([1e-2] + [1e-2] * self.num_fields + [1e-6]))
+        high = np.log(np.array([1e2] + [1e3] * self.num_fields + [10.0]))
+        current = np.clip(np.log(np.concatenate(([self.kernel(0)], self.thetas, [self.predicted_noise]))), low, high)
+        batch = [current] + [low + (high - low) * rng.random_sample(len(low)) for _ in range(candidates)]
+        scores = [self._sqexp_likelihood(log_params, sq_dists, y, gradient=False)[0] for log_params in batch]
+
+        best_value, best = self.log_marginal_likelihood(), None
+        for i in np.argsort(scores)[::-1][:starts]:
+            value, log_params = self._ascend(batch[i], sq_dists, y, low, high, iterations)
+            if value > best_value:
+                best_value, best = value, log_params
+        if best is not None:
+            self.kernel = functools.partial(sqexp_kernel, np.exp(best[0]), 1.0)
+            self.thetas = np.exp(best[1:-1])
+            self.predicted_noise = np.exp(best[-1])
+            self._refactor()
+        return best_value
 
     def gp_cov(self, x, predicted_noise):
         '''Return the covariance matrix of x and itself, with u added as noise.'''
@@ -60,32 +209,149 @@ class EGO():
         uncorr_noise = np.random.normal(size=cov.shape[0])
         return np.dot(np.linalg.cholesky(cov), uncorr_noise)
 
-    def generate_predictions(self, interp_x):
+    def generate_predictions(self, interp_x, chunk_size:int=4096):
         '''Return estimates of y values and standard deviations for predictions interp_x.
-           interp_x must be a numpy array of shape (#, 1),
-           which can be done with old_interp_x[:,np.newaxis]'''
-        # Generate the covariance matrix of data_x against itself.
-        data_cov = self.gp_cov(self.x, self.predicted_noise) # shape: len(x), len(x)
-
-        # Generate the covariance matrix of data_x against the prediction points.
-        # Matrix of separations: r[i,j] = x[j] - x[i]
-        r = self.delta_f(interp_x, np.transpose(self.x)) # shape: len(x), len(interp_x)
-        di_cov = self.kernel(r) # shape: len(x), len(interp_x)
-        
-        # Determine the weights to apply to data_y points. Apply them.
-        cinv = np.linalg.inv(data_cov) # shape: len(x), len(x)
-        wt = np.dot(cinv, di_cov) # shape: len(x), len(interp_x)
+           interp_x must be a numpy array of shape (#, num_fields),
+           which for one field can be done with old_interp_x[:,np.newaxis]
+           Points are predicted chunk_size at a time, so memory stays at len(x) * chunk_size
+           however many points are asked for.'''
+        interp_x = np.asarray(interp_x, dtype=float).reshape(-1, self.num_fields)
+        interp_y = np.empty(len(interp_x))
+        interp_u = np.empty(len(interp_x))
+
+        # With data_cov = L @ L.T, the weights inv(data_cov) @ di_cov applied to data_y points are
+        # inv(L).T @ v where v = inv(L) @ di_cov, so only triangular solves against the kept factor are needed.
         average_y = np.average(self.y)
-        interp_y = np.dot(wt.T, self.y-average_y) + average_y # shape: len(interp_x)
-
-        # generate the matrix of variances. Take the (matrix) square root to get the (matrix) standard deviation.
-        interp_cov = self.kernel(0) - np.dot(di_cov.T, wt) # shape: len(interp_x), len(interp_x)
-        #TODO: Is this where the vertical correction would apply?
+        z = solve_triangular(self.chol, self.y-average_y) # shape: len(x)
         std_y = np.std(self.y)
-        interp_u = np.sqrt(np.diag(std_y * interp_cov)) # shape: len(interp_x)
+
+        for start in range(0, len(interp_x), chunk_size):
+            chunk = interp_x[start:start+chunk_size]
+            # Generate the covariance matrix of data_x against the prediction points.
+            # Matrix of separations: r[i,j] = x[j] - x[i]
+            r = self.delta_f(chunk, np.transpose(self.x)) # shape: len(x), len(chunk)
+            di_cov = self.kernel(r) # shape: len(x), len(chunk)
+            v = solve_triangular(self.chol, di_cov) # shape: len(x), len(chunk)
+            interp_y[start:start+len(chunk)] = np.dot(v.T, z) + average_y
+
+            # Only the variances are needed: the diagonal of kernel(0) - v.T @ v, without forming the matrix.
+            #TODO: Is this where the vertical correction would apply?
+            interp_var = self.kernel(0) - np.einsum('ij,ij->j', v, v) # shape: len(chunk)
+            # The kernel is in units of the variance of y, so the standard deviation scales with std_y.
+            interp_u[start:start+len(chunk)] = std_y * np.sqrt(np.maximum(interp_var, 0))
 
         return interp_y, interp_u
 
+    def upper_confidence_bound(self, interp_x, kappa:float=2.0):
+        '''Return the predicted y plus kappa standard deviations at each of interp_x.'''
+        interp_y, interp_u = self.generate_predictions(interp_x)
+        return interp_y + kappa * interp_u
+
+    def expected_improvement(self, interp_x, best:float=None, xi:float=0.0):
+        '''Return how much each of interp_x is expected to improve on best (by default the highest y so far) by more than xi.'''
+        interp_y, interp_u = self.generate_predictions(interp_x)
+        if best is None:
+            best = np.max(self.y)
+        gain = interp_y - best - xi
+        with np.errstate(divide='ignore', invalid='ignore'):
+            z = np.where(interp_u > 0, gain / interp_u, 0)
+        improvement = gain * normal_cdf(z) + interp_u * np.exp(-0.5 * z**2) / np.sqrt(2 * np.pi)
+        # With no uncertainty left, the improvement is just the predicted gain
+        return np.where(interp_u > 0, improvement, np.maximum(gain, 0))
+
+    def acquisition(self, interp_x, kind:str='ei', exclude_radius:float=1e-3, **kwargs):
+        '''Return the acquisition function kind ('ei' for expected_improvement, 'ucb' for upper_confidence_bound) at each of interp_x.
+           Points within exclude_radius of a point already added score -inf, so they are never proposed again.'''
+        interp_x = np.asarray(interp_x, dtype=float).reshape(-1, self.num_fields)
+        if kind == 'ei':
+            scores = self.expected_improvement(interp_x, **kwargs)
+        elif kind == 'ucb':
+            scores = self.upper_confidence_bound(interp_x, **kwargs)
+        else:
+            raise ValueError("Unknown acquisition function: {}".format(kind))
+        if exclude_radius > 0 and self.n:
+            separation = np.sqrt(np.maximum(np.sum(interp_x**2, axis=1)[:, np.newaxis] + np.sum(self.x**2, axis=1)[np.newaxis, :]
+                                            - 2 * np.dot(interp_x, self.x.T), 0)) # shape: len(interp_x), len(x)
+            scores = np.where(separation.min(axis=1) < exclude_radius, -np.inf, scores)
+        return scores
+
+    def maximize_acquisition(self, kind:str='ei', samples:int=4096, starts:int=8, iterations:int=50, rng=None, **kwargs):
+        '''Return (x, score): the point of the unit cube with the highest acquisition (see acquisition, which takes kwargs).
+           The best starts of samples random points are refined together by compass search: each tries a step along
+           every dimension in both directions, moves if that improves, and halves its step if not.'''
+        rng = rng if rng is not None else np.random
+        candidates = rng.random_sample((samples, self.num_fields))
+        scores = self.acquisition(candidates, kind, **kwargs)
+        top = np.argsort(scores)[::-1][:starts]
+        points, values = candidates[top], scores[top]
+
+        directions = np.vstack((np.eye(self.num_fields), -np.eye(self.num_fields))) # shape: 2 * num_fields, num_fields
+        step = np.full(len(points), 0.1)
+        rows = np.arange(len(points))
+        for _ in range(iterations):
+            trials = np.clip(points[:, np.newaxis, :] + step[:, np.newaxis, np.newaxis] * directions, 0, 1) # shape: starts, 2 * num_fields, num_fields
+            trial_scores = self.acquisition(trials.reshape(-1, self.num_fields), kind, **kwargs).reshape(len(points), -1)
+            best = np.argmax(trial_scores, axis=1)
+            improved = trial_scores[rows, best] > values
+            points[improved] = trials[rows, best][improved]
+            values[improved] = trial_scores[rows, best][improved]
+            step[~improved] *= 0.5
+            if step.max() < 1e-4:
+                break
+        best = np.argmax(values)
+        return points[best], values[best]
+
+    def propose_batch(self, k:int, kind:str='ei', strategy:str='kriging_believer', lie:float=None, rng=None, **kwargs):
+        '''Return k points (shape k, num_fields) of the unit cube to evaluate together.
+           Points are chosen one at a time with maximize_acquisition (which takes kwargs). After each, a made-up y is added
+           there so the next point goes elsewhere: the predicted y ('kriging_believer'), or lie ('constant_liar', by default
+           the lowest y so far), without noise. The made-up points are removed before returning; hyperparameters are not refitted.'''
+        if strategy == 'constant_liar':
+            lie = np.min(self.y) if lie is None else lie
+        elif strategy != 'kriging_believer':
+            raise ValueError("Unknown batch strategy: {}".format(strategy))
+
+        n = self.n
+        proposals = []
+        try:
+            for _ in range(k):
+                x, _ = self.maximize_acquisition(kind, rng=rng, **kwargs)
+                proposals.append(x)
+                believed = self.generate_predictions(x[np.newaxis, :])[0][0] if strategy == 'kriging_believer' else lie
+                # Added without noise, so the made-up point fully removes the uncertainty there
+                self._extend(believed, x, 0.0)
+        finally:
+            # The Cholesky factor's first n rows only depend on the first n points, so forgetting the made-up points is enough
+            self.n = n
+        return np.array(proposals).reshape(-1, self.num_fields)
+
+def normal_cdf(z):
+    '''The standard normal cumulative distribution function, elementwise.'''
+    return 0.5 * (1 + _erf(np.asarray(z, dtype=float) / np.sqrt(2)))
+
+_erf = np.vectorize(math.erf, otypes=[float])
+
+def solve_triangular(lower, b, transpose=False, block=64):
+    '''Solve lower @ x = b (or lower.T @ x = b with transpose) for x, where lower is lower-triangular.
+       b may be a vector or a matrix of right-hand sides. Works a block of rows at a time: rows already
+       solved are subtracted from the block in one matrix product, then the block is solved by forward
+       (or back) substitution a row at a time, so the cost is O(n^2) per right-hand side.'''
+    n = lower.shape[0]
+    x = np.array(b, dtype=float)
+    if not transpose:
+        for start in range(0, n, block):
+            end = min(start + block, n)
+            x[start:end] -= np.dot(lower[start:end, :start], x[:start])
+            for i in range(start, end):
+                x[i] = (x[i] - np.dot(lower[i, start:i], x[start:i])) / lower[i, i]
+    else:
+        for end in range(n, 0, -block):
+            start = max(end - block, 0)
+            x[start:end] -= np.dot(lower[end:, start:end].T, x[end:])
+            for i in range(end - 1, start - 1, -1):
+                x[i] = (x[i] - np.dot(lower[i + 1:end, i], x[i + 1:end])) / lower[i, i]
+    return x
+
 def sqexp_kernel(a, s, r):
     '''A square-exponent kernel. Provides a measure of correlatedness of two points separated by r.'''
     return a * np.exp(-0.5 * (r / s)**2)
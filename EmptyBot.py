@@ -4,12 +4,34 @@
 # Import the Halite SDK, which will let you interact with the game.
 import hlt
 
+class EmptyBot():
+    '''A bot that never builds or moves anything. Used as the opponent when measuring FlinkBot.
+    Has the same game-loop methods as MyBot.FlinkBot, so LocalEngine.run_in_process can drive either.'''
+    def __init__(self):
+        self.game = None
+
+    def start_game(self, game=None):
+        '''Run hlt.Game(), or take an already-created game.'''
+        self.game = game if game is not None else hlt.Game()
+
+    def ready(self):
+        self.game.ready("EmptyBot") # Readying starts 2-second turn timer phase
+
+    def update(self):
+        self.game.update_frame()
+
+    def one_game_step(self):
+        '''No commands: every ship (there are none) stays still.'''
+        return []
+
+    def submit(self, command_queue):
+        self.game.end_turn(command_queue)
+
 if __name__ == "__main__":
-    game = hlt.Game()
-    game.ready("EmptyBot") # Readying starts 2-second turn timer phase
+    empty_bot = EmptyBot()
+    empty_bot.start_game()
+    empty_bot.ready()
 
     while True:
-        game.update_frame()
-        command_queue = ""
-        game.end_turn(command_queue)
-
+        empty_bot.update()
+        empty_bot.submit(empty_bot.one_game_step())
@@ -0,0 +1,507 @@
+# Python 3.6
+# rules: https://web.archive.org/web/20181019011459/http://www.halite.io/learn-programming-challenge/game-overview
+
+'''A headless, pure-Python stand-in for the Halite III engine (halite.exe).
+
+Match holds the game state and applies the rules from hlt.constants' engine constants: spawning, dropoff construction,
+move costs, collisions, mining, inspiration and deposits, on a seeded, symmetric map.
+run_match drives bot subprocesses over the same stdin/stdout protocol hlt.networking.Game reads, with per-turn timeouts.
+run_in_process drives bot objects (FlinkBot, EmptyBot) directly, handing each an hlt.Game fed straight from the match state.
+
+Usage: python LocalEngine.py [--width 32] [--height 32] [--seed N] "python MyBot.py" "python EmptyBot.py"
+'''
+
+import argparse
+import json
+import math
+import queue
+import random
+import subprocess
+import sys
+import threading
+from collections import namedtuple
+
+import numpy as np
+
+from hlt import CommandQueue, Game
+from hlt.common import ValueReader
+
+DEFAULT_CONSTANTS = {
+    'NEW_ENTITY_ENERGY_COST': 1000,
+    'DROPOFF_COST': 4000,
+    'MAX_ENERGY': 1000,
+    'EXTRACT_RATIO': 4,
+    'MOVE_COST_RATIO': 10,
+    'INSPIRATION_ENABLED': True,
+    'INSPIRATION_RADIUS': 4,
+    'INSPIRATION_SHIP_COUNT': 2,
+    'INSPIRED_EXTRACT_RATIO': 4,
+    'INSPIRED_BONUS_MULTIPLIER': 2.0,
+    'INSPIRED_MOVE_COST_RATIO': 10,
+    'INITIAL_ENERGY': 5000,
+}
+
+DIRECTIONS = {'n': (0, -1), 's': (0, 1), 'e': (1, 0), 'w': (-1, 0), 'o': (0, 0)}
+
+MatchResult = namedtuple('MatchResult', ['seed', 'width', 'height', 'turns', 'scores', 'history', 'collisions', 'eliminated'])
+MatchResult.__doc__ = '''The outcome of one match.
+
+scores: each player's final stored halite. history: each turn's stored halite, one list per turn in player order.
+collisions: how many of each player's ships were destroyed in collisions.
+eliminated: for each player, None, or (turn, reason) if it crashed, timed out or sent an invalid command.'''
+
+
+def max_turns(width, height):
+    '''Game length the real engine uses for a map size: 400 turns on 32x32 up to 500 on 64x64.'''
+    return 400 + (max(width, height) - 32) * 25 // 8
+
+
+def generate_map(width, height, num_players, seed):
+    '''Generate a seeded, symmetric halite map.
+
+    One tile of fractal value noise is generated and mirrored into every player's quarter (2 players split the map left/right, 4 players into quadrants),
+    so no player starts with a better neighbourhood. Each shipyard sits in the middle of its player's tile.
+
+    :return: (halite as an int64 (height, width) array, [(x, y) shipyard for each player])
+    '''
+    rng = np.random.RandomState(seed)
+    tile_width = width // 2 if num_players > 1 else width
+    tile_height = height // 2 if num_players > 2 else height
+
+    noise = np.zeros((tile_height, tile_width))
+    amplitude = 1.0
+    cells = 2
+    while cells <= max(tile_width, tile_height):
+        coarse = rng.random_sample((cells + 1, cells + 1))
+        # Bilinear upsampling of the coarse grid to the tile
+        ys = np.linspace(0, cells, tile_height, endpoint=False)
+        xs = np.linspace(0, cells, tile_width, endpoint=False)
+        y0, x0 = ys.astype(int), xs.astype(int)
+        fy, fx = (ys - y0)[:, None], (xs - x0)[None, :]
+        top = coarse[y0][:, x0] * (1 - fx) + coarse[y0][:, x0 + 1] * fx
+        bottom = coarse[y0 + 1][:, x0] * (1 - fx) + coarse[y0 + 1][:, x0 + 1] * fx
+        noise += amplitude * (top * (1 - fy) + bottom * fy)
+        amplitude *= 0.5
+        cells *= 2
+    noise += 0.5 * amplitude * rng.random_sample((tile_height, tile_width))
+    noise = (noise - noise.min()) / max(noise.max() - noise.min(), 1e-9)
+    tile = np.round(noise ** 2.5 * 1000).astype(np.int64)
+
+    halite = np.zeros((height, width), dtype=np.int64)
+    halite[:tile_height, :tile_width] = tile
+    if num_players > 1:
+        halite[:tile_height, width - tile_width:] = tile[:, ::-1]
+    if num_players > 2:
+        halite[height - tile_height:, :] = halite[:tile_height, :][::-1, :]
+
+    centre_x, centre_y = tile_width // 2, tile_height // 2
+    shipyards = [(centre_x, centre_y), (width - 1 - centre_x, centre_y),
+                 (centre_x, height - 1 - centre_y), (width - 1 - centre_x, height - 1 - centre_y)][:num_players]
+    if num_players == 1:
+        shipyards = [(width // 2, height // 2)]
+    for x, y in shipyards:
+        halite[y, x] = 0
+    return halite, shipyards
+
+
+class _Ship:
+    __slots__ = ('id', 'owner', 'x', 'y', 'halite')
+
+    def __init__(self, ship_id, owner, x, y):
+        self.id = ship_id
+        self.owner = owner
+        self.x = x
+        self.y = y
+        self.halite = 0
+
+
+class _Player:
+    def __init__(self, player_id, shipyard, energy):
+        self.id = player_id
+        self.shipyard = shipyard
+        self.energy = energy
+        self.ships = {}
+        self.dropoffs = {}
+        self.collisions = 0
+        self.eliminated = None
+
+
+class Match:
+    '''The state of one match, advanced a turn at a time by step().'''
+    def __init__(self, num_players=2, width=32, height=32, seed=None, constants=None):
+        '''
+        :param seed: Map seed. A random one is picked if omitted.
+        :param constants: Overrides for DEFAULT_CONSTANTS (engine names, e.g. {'MAX_TURNS': 100})
+        '''
+        self.seed = seed if seed is not None else random.randrange(1 << 31)
+        self.width = width
+        self.height = height
+        self.constants = dict(DEFAULT_CONSTANTS, MAX_TURNS=max_turns(width, height))
+        self.constants.update(constants or {})
+        self.constants.update(map_width=width, map_height=height, game_seed=self.seed)
+        self.halite, shipyards = generate_map(width, height, num_players, self.seed)
+        self.players = [_Player(i, shipyard, self.constants['INITIAL_ENERGY']) for i, shipyard in enumerate(shipyards)]
+        self.turn_number = 0
+        self.history = []
+        self._next_id = 0
+        self._changed_cells = set()
+
+    @property
+    def finished(self):
+        '''Whether every turn has been played, or no player is left.'''
+        return self.turn_number >= self.constants['MAX_TURNS'] or all(player.eliminated for player in self.players)
+
+    def init_message(self, player_id):
+        '''The text the engine sends a player before the game starts.'''
+        lines = [json.dumps(self.constants), f"{len(self.players)} {player_id}"]
+        lines.extend(f"{player.id} {player.shipyard[0]} {player.shipyard[1]}" for player in self.players)
+        lines.append(f"{self.width} {self.height}")
+        lines.extend(" ".join(map(str, row)) for row in self.halite.tolist())
+        return "\n".join(lines) + "\n"
+
+    def init_values(self, player_id):
+        '''The integers of init_message after its constants line, for in-process players.'''
+        values = [len(self.players), player_id]
+        for player in self.players:
+            values.extend((player.id, player.shipyard[0], player.shipyard[1]))
+        values.extend((self.width, self.height))
+        values.extend(self.halite.ravel().tolist())
+        return values
+
+    def frame_message(self):
+        '''The text the engine sends every player at the start of the next turn: turn number, every player's entities, and the cells whose halite changed last turn.'''
+        lines = [str(self.turn_number + 1)]
+        for player in self.players:
+            lines.append(f"{player.id} {len(player.ships)} {len(player.dropoffs)} {player.energy}")
+            lines.extend(f"{ship.id} {ship.x} {ship.y} {ship.halite}" for ship in player.ships.values())
+            lines.extend(f"{dropoff_id} {x} {y}" for dropoff_id, (x, y) in player.dropoffs.items())
+        cells = sorted(self._changed_cells)
+        lines.append(str(len(cells)))
+        lines.extend(f"{x} {y} {self.halite[y, x]}" for x, y in cells)
+        return "\n".join(lines) + "\n"
+
+    def frame_values(self):
+        '''The integers of frame_message, for in-process players.'''
+        values = [self.turn_number + 1]
+        for player in self.players:
+            values.extend((player.id, len(player.ships), len(player.dropoffs), player.energy))
+            for ship in player.ships.values():
+                values.extend((ship.id, ship.x, ship.y, ship.halite))
+            for dropoff_id, (x, y) in player.dropoffs.items():
+                values.extend((dropoff_id, x, y))
+        cells = sorted(self._changed_cells)
+        values.append(len(cells))
+        for x, y in cells:
+            values.extend((x, y, int(self.halite[y, x])))
+        return values
+
+    def eliminate(self, player_id, reason):
+        '''Remove a player from the game (its ships are destroyed), as the engine does when a bot crashes, times out or errs.'''
+        player = self.players[player_id]
+        if player.eliminated is None:
+            player.eliminated = (self.turn_number + 1, reason)
+            player.ships = {}
+
+    def _parse(self, player, command_line):
+        '''Split a player's command line into (spawn, constructs, moves), eliminating the player on an invalid command.'''
+        tokens = command_line.split()
+        spawn = False
+        constructs = []
+        moves = {}
+        commanded = set()
+        i = 0
+        try:
+            while i < len(tokens):
+                if tokens[i] == 'g':
+                    spawn = True
+                    i += 1
+                    continue
+                if tokens[i] == 'c':
+                    ship_id, i = int(tokens[i + 1]), i + 2
+                    direction = None
+                elif tokens[i] == 'm':
+                    ship_id, direction, i = int(tokens[i + 1]), tokens[i + 2], i + 3
+                    if direction not in DIRECTIONS:
+                        raise ValueError(f"unknown direction {direction}")
+                else:
+                    raise ValueError(f"unknown command {tokens[i]}")
+                if ship_id not in player.ships:
+                    raise ValueError(f"ship {ship_id} is not theirs")
+                if ship_id in commanded:
+                    raise ValueError(f"ship {ship_id} was given two commands")
+                commanded.add(ship_id)
+                if direction is None:
+                    constructs.append(ship_id)
+                else:
+                    moves[ship_id] = direction
+        except (IndexError, ValueError) as error:
+            self.eliminate(player.id, f"invalid command: {error}")
+            return False, [], {}
+        return spawn, constructs, moves
+
+    def _inspired(self):
+        '''Ids of ships with at least INSPIRATION_SHIP_COUNT opponent ships within INSPIRATION_RADIUS.'''
+        if not self.constants['INSPIRATION_ENABLED']:
+            return set()
+        ships = [ship for player in self.players for ship in player.ships.values()]
+        if not ships:
+            return set()
+        xs = np.array([ship.x for ship in ships])
+        ys = np.array([ship.y for ship in ships])
+        owners = np.array([ship.owner for ship in ships])
+        dx = np.abs(xs[:, None] - xs[None, :])
+        dy = np.abs(ys[:, None] - ys[None, :])
+        distance = np.minimum(dx, self.width - dx) + np.minimum(dy, self.height - dy)
+        nearby = (distance <= self.constants['INSPIRATION_RADIUS']) & (owners[:, None] != owners[None, :])
+        counts = nearby.sum(axis=1)
+        return {ship.id for ship, count in zip(ships, counts) if count >= self.constants['INSPIRATION_SHIP_COUNT']}
+
+    def _structure_owner(self, x, y):
+        for player in self.players:
+            if player.shipyard == (x, y) or (x, y) in player.dropoffs.values():
+                return player
+        return None
+
+    def step(self, commands):
+        '''Play one turn.
+
+        :param commands: {player id: the command line the player sent}. Players missing from it do nothing.
+        '''
+        c = self.constants
+        halite = self.halite
+        self._changed_cells = set()
+        inspired = self._inspired()
+        parsed = {player.id: self._parse(player, commands.get(player.id, "")) for player in self.players if player.eliminated is None}
+
+        # Dropoffs: the ship's cargo and the cell's halite count towards the cost
+        for player_id, (_, constructs, _) in parsed.items():
+            player = self.players[player_id]
+            for ship_id in constructs:
+                ship = player.ships[ship_id]
+                if self._structure_owner(ship.x, ship.y) is not None:
+                    continue
+                cost = c['DROPOFF_COST'] - ship.halite - int(halite[ship.y, ship.x])
+                if player.energy >= cost:
+                    player.energy -= cost
+                    player.dropoffs[self._next_id] = (ship.x, ship.y)
+                    self._next_id += 1
+                    halite[ship.y, ship.x] = 0
+                    self._changed_cells.add((ship.x, ship.y))
+                    del player.ships[ship_id]
+
+        # Moves: a ship that cannot pay to leave its cell stays (and mines)
+        stayed = set()
+        for player_id, (_, _, moves) in parsed.items():
+            for ship in self.players[player_id].ships.values():
+                direction = moves.get(ship.id, 'o')
+                ratio = c['INSPIRED_MOVE_COST_RATIO'] if ship.id in inspired else c['MOVE_COST_RATIO']
+                cost = int(halite[ship.y, ship.x]) // ratio
+                if direction == 'o' or ship.halite < cost:
+                    stayed.add(ship.id)
+                    continue
+                ship.halite -= cost
+                dx, dy = DIRECTIONS[direction]
+                ship.x = (ship.x + dx) % self.width
+                ship.y = (ship.y + dy) % self.height
+
+        for player_id, (spawn, _, _) in parsed.items():
+            player = self.players[player_id]
+            if spawn and player.energy >= c['NEW_ENTITY_ENERGY_COST']:
+                player.energy -= c['NEW_ENTITY_ENERGY_COST']
+                player.ships[self._next_id] = _Ship(self._next_id, player.id, *player.shipyard)
+                self._next_id += 1
+
+        # Collisions: every ship on a shared cell is destroyed, and its cargo goes to the cell (or the structure's owner)
+        occupants = {}
+        for player in self.players:
+            for ship in player.ships.values():
+                occupants.setdefault((ship.x, ship.y), []).append(ship)
+        for (x, y), ships in occupants.items():
+            if len(ships) < 2:
+                continue
+            cargo = sum(ship.halite for ship in ships)
+            owner = self._structure_owner(x, y)
+            if owner is not None:
+                owner.energy += cargo
+            elif cargo:
+                halite[y, x] += cargo
+                self._changed_cells.add((x, y))
+            for ship in ships:
+                self.players[ship.owner].collisions += 1
+                del self.players[ship.owner].ships[ship.id]
+
+        # Mining by ships that stayed put, then deposits at their owner's shipyard or dropoffs
+        for player in self.players:
+            deposits = {player.shipyard} | set(player.dropoffs.values())
+            for ship in player.ships.values():
+                if (ship.x, ship.y) in deposits:
+                    player.energy += ship.halite
+                    ship.halite = 0
+                    continue
+                if ship.id not in stayed or halite[ship.y, ship.x] == 0:
+                    continue
+                ship_inspired = ship.id in inspired
+                ratio = c['INSPIRED_EXTRACT_RATIO'] if ship_inspired else c['EXTRACT_RATIO']
+                space = c['MAX_ENERGY'] - ship.halite
+                extracted = min(math.ceil(halite[ship.y, ship.x] / ratio), space)
+                gained = extracted
+                if ship_inspired:
+                    gained += int(extracted * c['INSPIRED_BONUS_MULTIPLIER'])
+                ship.halite += min(gained, space)
+                if extracted:
+                    halite[ship.y, ship.x] -= extracted
+                    self._changed_cells.add((ship.x, ship.y))
+
+        self.turn_number += 1
+        self.history.append([player.energy for player in self.players])
+
+    def result(self):
+        '''The match's outcome so far, as a MatchResult.'''
+        return MatchResult(self.seed, self.width, self.height, self.turn_number,
+                           [player.energy for player in self.players], self.history,
+                           [player.collisions for player in self.players],
+                           [player.eliminated for player in self.players])
+
+
+class SubprocessBot:
+    '''A bot run as a subprocess, spoken to over stdin/stdout. Lines are read on a background thread so reads can time out.'''
+    def __init__(self, command, cwd=None, stderr=subprocess.DEVNULL):
+        self.process = subprocess.Popen(command, shell=True, cwd=cwd, stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                                        stderr=stderr, universal_newlines=True, bufsize=1)
+        self._lines = queue.Queue()
+        threading.Thread(target=self._read_lines, daemon=True).start()
+
+    def _read_lines(self):
+        for line in self.process.stdout:
+            self._lines.put(line)
+        self._lines.put(None)
+
+    def send(self, text):
+        '''Write text to the bot's stdin. Returns False if the bot has gone away.'''
+        try:
+            self.process.stdin.write(text)
+            self.process.stdin.flush()
+            return True
+        except (BrokenPipeError, OSError, ValueError):
+            return False
+
+    def receive(self, timeout):
+        '''The bot's next output line, or None if it did not answer within timeout seconds (or exited).'''
+        try:
+            line = self._lines.get(timeout=timeout)
+        except queue.Empty:
+            return None
+        return None if line is None else line.rstrip("\n")
+
+    def close(self):
+        '''Close the bot's stdin (ending its game loop) and wait for it to exit.'''
+        try:
+            self.process.stdin.close()
+        except (BrokenPipeError, OSError):
+            pass
+        try:
+            self.process.wait(5)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+
+
+def run_match(bot_commands, width=32, height=32, seed=None, constants=None, cwd=None,
+              turn_timeout=2.0, init_timeout=30.0, bot_stderr=subprocess.DEVNULL):
+    '''Play one match between bot subprocesses.
+
+    :param bot_commands: A shell command per player, e.g. ["python MyBot.py -p 0.5 0.5 0.5", "python EmptyBot.py"]
+    :param cwd: Directory the bots run in (and write their logs to)
+    :param turn_timeout: Seconds a bot has to answer each turn before it is eliminated
+    :param init_timeout: Seconds a bot has to answer the initial map with its name
+    :return: A MatchResult
+    '''
+    match = Match(len(bot_commands), width, height, seed, constants)
+    bots = [SubprocessBot(command, cwd, bot_stderr) for command in bot_commands]
+    try:
+        for player_id, bot in enumerate(bots):
+            bot.send(match.init_message(player_id))
+        for player_id, bot in enumerate(bots):
+            if bot.receive(init_timeout) is None:
+                match.eliminate(player_id, "no response to initialization")
+
+        while not match.finished:
+            frame = match.frame_message()
+            commands = {}
+            for player_id, bot in enumerate(bots):
+                if match.players[player_id].eliminated is not None:
+                    continue
+                line = bot.receive(turn_timeout) if bot.send(frame) else None
+                if line is None:
+                    match.eliminate(player_id, "timed out or exited")
+                else:
+                    commands[player_id] = line
+            match.step(commands)
+    finally:
+        for bot in bots:
+            bot.close()
+    return match.result()
+
+
+def command_line(commands):
+    '''Join a bot's commands (a CommandQueue, a list of command strings, or a string) into the line the engine reads.'''
+    if isinstance(commands, str):
+        return commands
+    if isinstance(commands, CommandQueue):
+        commands = commands.to_commands()
+    return " ".join(commands)
+
+
+def run_in_process(bots, width=32, height=32, seed=None, constants=None):
+    '''Play one match between bot objects in this process, with no subprocesses or text protocol.
+
+    Each bot is given an offline hlt.Game fed by a ValueReader, through start_game(game). Every turn the engine hands the frame's values to the bot's reader,
+    calls bot.update() (which reads them with Game.update_frame) and takes bot.one_game_step()'s commands. FlinkBot and EmptyBot both work this way.
+    A bot that raises an exception is eliminated. Each Game keeps its own ship instances and reloads hlt.constants from the match's constants,
+    so bots in one match, and matches run one after another in one process (e.g. a MatchRunner worker), share no game state.
+
+    :param bots: One bot object per player
+    :return: A MatchResult
+    '''
+    match = Match(len(bots), width, height, seed, constants)
+    readers = []
+    for player_id, bot in enumerate(bots):
+        reader = ValueReader()
+        reader.feed_line(json.dumps(match.constants))
+        reader.feed(match.init_values(player_id))
+        readers.append(reader)
+        try:
+            bot.start_game(Game(reader=reader))
+        except Exception as error:
+            match.eliminate(player_id, f"crashed during initialization: {error!r}")
+
+    while not match.finished:
+        values = match.frame_values()
+        commands = {}
+        for player_id, (bot, reader) in enumerate(zip(bots, readers)):
+            if match.players[player_id].eliminated is not None:
+                continue
+            reader.feed(values)
+            try:
+                bot.update()
+                commands[player_id] = command_line(bot.one_game_step())
+            except Exception as error:
+                match.eliminate(player_id, f"crashed: {error!r}")
+        match.step(commands)
+    return match.result()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Headless Halite III engine')
+    parser.add_argument('bots', nargs='+', help='Shell command to run each bot')
+    parser.add_argument('--width', type=int, default=32)
+    parser.add_argument('--height', type=int, default=32)
+    parser.add_argument('--seed', type=int, default=None)
+    parser.add_argument('--turns', type=int, default=None, help='Override the number of turns')
+    parser.add_argument('--timeout', type=float, default=2.0, help='Seconds each bot has per turn')
+    cli_args = parser.parse_args()
+
+    overrides = {'MAX_TURNS': cli_args.turns} if cli_args.turns else None
+    result = run_match(cli_args.bots, cli_args.width, cli_args.height, cli_args.seed, overrides,
+                       turn_timeout=cli_args.timeout, bot_stderr=None)
+    print(json.dumps({'seed': result.seed, 'turns': result.turns, 'scores': result.scores,
+                      'collisions': result.collisions, 'eliminated': result.eliminated}), file=sys.stdout)
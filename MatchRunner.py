@@ -0,0 +1,118 @@
+# Python 3.6
+
+'''Runs many LocalEngine matches at once across a process pool, each in its own working directory.
+
+A MatchSpec describes one match: FlinkBot's personality parameters, map size, seed, timeouts, and optionally the shell commands
+of subprocess bots. Without commands, the match is FlinkBot(params) against EmptyBot inside the worker process (LocalEngine.run_in_process).
+run_matches yields a MatchRecord for each match as it finishes, in whatever order they finish.
+
+    specs = [MatchSpec(params=(0.5, 0.5, 0.5), seed=seed) for seed in range(100)]
+    for record in run_matches(specs):
+        print(record.index, record.best)
+'''
+
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+import traceback
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import EmptyBot
+import LocalEngine
+import MyBot
+
+LOCATION = os.path.dirname(os.path.abspath(__file__))
+
+MatchSpec = namedtuple('MatchSpec', ['params', 'width', 'height', 'seed', 'bots', 'turn_timeout', 'tag'])
+MatchSpec.__new__.__defaults__ = ((0.5, 0.5, 0.5), 32, 32, None, None, 2.0, None)
+MatchSpec.__doc__ = '''One match to run.
+
+params: FlinkBot's personality parameters. seed: map seed, random if None.
+bots: shell commands of subprocess bots (see flinkbot_command), run in the match's working directory. None plays FlinkBot(params) against EmptyBot in-process.
+turn_timeout: seconds a subprocess bot has per turn. tag: anything, handed back in the record (e.g. to group repeats).'''
+
+MatchRecord = namedtuple('MatchRecord', ['index', 'spec', 'seed', 'scores', 'best', 'turns', 'collisions', 'eliminated',
+                                         'elapsed', 'workdir', 'error'])
+MatchRecord.__doc__ = '''The outcome of one match.
+
+index: the spec's position in the list given to run_matches. best: the most halite player 0 held on any turn.
+workdir: the match's working directory if it was kept, else None. error: the traceback if the match itself failed (the other fields are then None).'''
+
+
+def flinkbot_command(params, telemetry=False, record=None):
+    '''The shell command that runs MyBot.py as a subprocess bot with the given personality parameters.'''
+    command = f'"{sys.executable}" "{os.path.join(LOCATION, "MyBot.py")}" -p {" ".join(str(p) for p in params)}'
+    if telemetry:
+        command += " -telemetry"
+    if record:
+        command += f" -record {record}"
+    return command
+
+
+def emptybot_command():
+    '''The shell command that runs EmptyBot.py as a subprocess bot.'''
+    return f'"{sys.executable}" "{os.path.join(LOCATION, "EmptyBot.py")}"'
+
+
+def play(spec, workdir):
+    '''Play one match in the given working directory (which must exist).
+
+    :return: A LocalEngine.MatchResult
+    '''
+    if spec.bots is None:
+        bots = [MyBot.FlinkBot(list(spec.params)), EmptyBot.EmptyBot()]
+        return LocalEngine.run_in_process(bots, spec.width, spec.height, spec.seed)
+    return LocalEngine.run_match(spec.bots, spec.width, spec.height, spec.seed, cwd=workdir, turn_timeout=spec.turn_timeout)
+
+
+def _run(index, spec, root, keep_files):
+    '''Pool worker: play a spec in its own directory under root and turn the outcome into a MatchRecord.'''
+    workdir = os.path.join(root, f"match-{index}")
+    os.makedirs(workdir, exist_ok=True)
+    start = time.time()
+    try:
+        result = play(spec, workdir)
+    except Exception:
+        record = MatchRecord(index, spec, spec.seed, None, None, None, None, None, time.time() - start,
+                             workdir if keep_files else None, traceback.format_exc())
+    else:
+        best = max(turn[0] for turn in result.history) if result.history else None
+        record = MatchRecord(index, spec, result.seed, result.scores, best, result.turns, result.collisions,
+                             result.eliminated, time.time() - start, workdir if keep_files else None, None)
+    if not keep_files:
+        shutil.rmtree(workdir, ignore_errors=True)
+    return record
+
+
+def run_matches(specs, workers=None, root=None, keep_files=False):
+    '''Run matches across a process pool, yielding each MatchRecord as its match finishes.
+
+    :param specs: MatchSpecs to run
+    :param workers: Processes to use. Defaults to one per CPU.
+    :param root: Directory the per-match working directories (match-<index>) are made in. A temporary directory if omitted.
+    :param keep_files: Keep each match's directory (bot logs, telemetry, recordings) instead of deleting it
+    '''
+    # Seeds are picked here, as forked workers would all inherit the same random state
+    specs = [spec if spec.seed is not None else spec._replace(seed=random.randrange(1 << 31)) for spec in specs]
+    temporary = root is None
+    if temporary:
+        root = tempfile.mkdtemp(prefix="halite-matches-")
+    os.makedirs(root, exist_ok=True)
+    workers = workers or os.cpu_count() or 1
+    try:
+        with ProcessPoolExecutor(max_workers=min(workers, max(len(specs), 1))) as pool:
+            futures = [pool.submit(_run, index, spec, root, keep_files) for index, spec in enumerate(specs)]
+            for future in as_completed(futures):
+                yield future.result()
+    finally:
+        if temporary and not keep_files:
+            shutil.rmtree(root, ignore_errors=True)
+
+
+def run_all(specs, workers=None, root=None, keep_files=False):
+    '''run_matches, collected into a list in the order of specs.'''
+    return sorted(run_matches(specs, workers, root, keep_files), key=lambda record: record.index)
@@ -11,130 +11,108 @@ import logging
 import time
 import pickle
 import argparse
+import atexit
 
 # Import the Halite SDK, which will let you interact with the game.
 import hlt
-from hlt import constants, commands # This library contains constant values.
-from hlt.positionals import Direction, Position # This library contains direction metadata to better interface with the game.
+from hlt import constants # This library contains constant values.
+from hlt import commands
+from hlt.positionals import Direction, Position, PositionArray # This library contains direction metadata to better interface with the game.
+from hlt.pathfinding import TargetIndex
+from hlt.assignment import assign_moves
+from hlt.telemetry import TelemetryWriter
+from hlt import snapshot
 
 #sys.argv[0] is "MyBot.py", which we don't need to save.
 parser = argparse.ArgumentParser(description='FlinkBot')
 parser.add_argument('-l', type=int, default=1, help='Logging level. See FlinkBot.sc_log docstring.')
-parser.add_argument('-pickle', action='store_true', help='If present, log game state on error.')
+parser.add_argument('-snapshot', '-pickle', dest='snapshot', action='store_true', help='If present, save a .npz snapshot of the game state on error (see write_state). -pickle is the old name, kept as an alias.')
+parser.add_argument('-telemetry', nargs='?', const='telemetry-{}.jsonl', default=None, help='Write structured telemetry to this file ({} becomes the player id). See hlt.telemetry.')
+parser.add_argument('-record', default=None, help='Record every turn of the game to this .npz file ({} becomes the player id). See hlt.snapshot.')
 parser.add_argument('-p', nargs=3, type=float, default=[0.5,0.5,0.5], help='Personality parameters. Between 0 and 1.')
-args = parser.parse_args()
+# Defaults until the bot is run as a script, so importing MyBot (e.g. from RunAndParse or LocalEngine) never reads someone else's command line.
+args = parser.parse_args([])
 
 logging_level = args.l
 
-def sc_log(level, message):
+def sc_log(level, message, *fmt_args):
     '''
     if logging_level >= level:
-        logging.info(message)
-    
+        logging.info(message, *fmt_args)
+
+    message is a %-style format string; it is only formatted with fmt_args if the level is enabled, and then off the turn's thread (see hlt.log_pipeline).
+    Pass values that will not change afterwards.
+
     Level 1: Minimum. Log map when available, halite per round, and other necessary information.
     Level 2: Log major calculation steps. Used to see process flow in logs.
     Level 3: Log various small things that happen. Mostly for earlier detailed debugging.
     
     '''
     if logging_level >= level:
-        logging.info(message)
-
-def spiral_walk(starting_x, starting_y):
-    '''Spiral walk iterator: yield a position in the square spiral starting at x,y, walking x+1 and turning towards y-1'''
-    sc_log(3, f"Walking a spiral from {starting_x},{starting_y}.")
-    x,y = starting_x, starting_y
-    yield Position(x,y)
-    i = 1
-    while True:
-        for _ in range(i):
-            x+=1
-        yield Position(x,y)
-        for _ in range(i):
-            y-=1
-            yield Position(x,y)
-        i+=1
-        for _ in range(i):
-            x-=1
-            yield Position(x,y)
-        for _ in range(i):
-            y+=1
-            yield Position(x,y)
-        i+=1
-
-def dist_betw_positions(start, end):
-    '''return (start.x-end.x)**2+(start.y-end.y)**2'''
-    return (start.x-end.x)**2+(start.y-end.y)**2
-
-def read_moved_ships(command_queue):
-    return [int(command.split(' ')[1]) for command in command_queue]
-
-def dir_to_pos(direction):
-    return Position(direction[0], direction[1])
-
-reverted_commands = {commands.NORTH: Direction.North,
-                     commands.SOUTH: Direction.South,
-                     commands.EAST:  Direction.East,
-                     commands.WEST:  Direction.West,
-                     commands.STAY_STILL: Direction.Still}
-
-def read_committed_positions(ships, command_queue):
-    if len(command_queue) > 0:
-        result = []
-        for command in command_queue:
-            _, ship_id, direction = command.split(" ")
-            ship = next((x for x in ships if x.id == int(ship_id)), None)
-            result.append(ship.position + dir_to_pos(reverted_commands[direction]))
-        return result
-    else:
-        return []
+        logging.info(message, *fmt_args)
+
+def dist_betw_positions(game_map, start, end):
+    '''return dx**2+dy**2, where dx and dy are measured the short way around the map'''
+    dx, dy = game_map.axis_distances(start, end)
+    return dx**2+dy**2
+
+def read_constants():
+    '''Collect the loaded hlt.constants into the dictionary FlinkBot keeps as self.CONSTANTS.'''
+    return {
+        'SHIP_COST': constants.SHIP_COST,
+        'DROPOFF_COST': constants.DROPOFF_COST,
+        'MAX_HALITE': constants.MAX_HALITE,
+        'MAX_TURNS': constants.MAX_TURNS,
+        'EXTRACT_RATIO': constants.EXTRACT_RATIO,
+        'MOVE_COST_RATIO': constants.MOVE_COST_RATIO,
+        'INSPIRATION_ENABLED': constants.INSPIRATION_ENABLED,
+        'INSPIRATION_RADIUS': constants.INSPIRATION_RADIUS,
+        'INSPIRATION_SHIP_COUNT': constants.INSPIRATION_SHIP_COUNT,
+        'INSPIRED_EXTRACT_RATIO': constants.INSPIRED_EXTRACT_RATIO,
+        'INSPIRED_BONUS_MULTIPLIER': constants.INSPIRED_BONUS_MULTIPLIER,
+        'INSPIRED_MOVE_COST_RATIO': constants.INSPIRED_MOVE_COST_RATIO,
+        'WIDTH': constants.WIDTH,
+        'HEIGHT': constants.HEIGHT
+    }
 
 class FlinkBot():
     '''A bot (game state + behaviors) for the Halite competition. Initialization begins hlt.Game().
     FlinkBot.start_game() runs hlt.Game() and starts X minute timer to do pre-processing.
     FlinkBot.ready() begins game.ready().
     '''
-    def __init__(self):
+    def __init__(self, params=None):
         '''Reserve class variables. These must be populated with one of the following:
         * self.start_game() - Used when the bot is intended to run in a loop.
         * self.perform_test() - Used for debugging to sample one game step from a saved game state.
+
+        params: personality parameters (see determine_personality_parameters). Taken from the -p argument if omitted.
         '''
+        self.params = params
         self.game = None
         self.game_map = None
         self.me = None
         self.ships = None
         self.q = None
         self.CONSTANTS = None
+        self.targets = {}
+        self.move_options = {}
+        self.target_index = None
+        self.telemetry = None
+        self.timing = {}
 
-    def start_game(self):
+    def start_game(self, game=None):
         ''' Initiate Stage 1: Pre-game scanning - Permitted X minutes here.
         Once game = hlt.Game() is run, you have access to the game map for computationally-intensive start-up pre-processing.
+        Pass an already-created game to play it instead of reading one from stdin (LocalEngine.run_in_process does this).
         '''
-        self.game = hlt.Game()
+        self.game = game if game is not None else hlt.Game()
         self.game_map = self.game.game_map
         self.me = self.game.me
         self.ships = self.me.get_ships()
-        self.CONSTANTS = {
-            'SHIP_COST': constants.SHIP_COST,
-            'DROPOFF_COST': constants.DROPOFF_COST,
-            'MAX_HALITE': constants.MAX_HALITE,
-            'MAX_TURNS': constants.MAX_TURNS,
-            'EXTRACT_RATIO': constants.EXTRACT_RATIO,
-            'MOVE_COST_RATIO': constants.MOVE_COST_RATIO,
-            'INSPIRATION_ENABLED': constants.INSPIRATION_ENABLED,
-            'INSPIRATION_RADIUS': constants.INSPIRATION_RADIUS,
-            'INSPIRATION_SHIP_COUNT': constants.INSPIRATION_SHIP_COUNT,
-            'INSPIRED_EXTRACT_RATIO': constants.INSPIRED_EXTRACT_RATIO,
-            'INSPIRED_BONUS_MULTIPLIER': constants.INSPIRED_BONUS_MULTIPLIER,
-            'INSPIRED_MOVE_COST_RATIO': constants.INSPIRED_MOVE_COST_RATIO,
-            'WIDTH': constants.WIDTH,
-            'HEIGHT': constants.HEIGHT
-        }
+        self.CONSTANTS = read_constants()
 
         if logging_level >= 1:
-            map_array = [
-                        [self.game_map[Position(x,y)].halite_amount for x in range(self.game_map.width)] for y in range(self.game_map.height)
-                        ]
-            sc_log(1, f"##FL-Map:{str(json.dumps(map_array))}")
+            sc_log(1, "##FL-Map:%s", json.dumps(self.game_map.halite.tolist()))
 
         p = self.determine_personality_parameters(self.game_map)
 
@@ -143,37 +121,60 @@ class FlinkBot():
             (0.5+p[1]*0.25)*self.CONSTANTS['MAX_HALITE'], # 50% to 75% of MAX_HALITE - amount of cargo above which ships believe they're returning cargo.
             1 + round(p[2]*29) # 1 to 30 - max number of bots
         )
-        logging.info('Initialized FlinkBot with parameters {p}')
+        logging.info('Initialized FlinkBot with parameters %s', p)
+
+        if args.telemetry:
+            self.telemetry = TelemetryWriter(args.telemetry.format(self.game.my_id))
+            self.telemetry.game(self.game.my_id, constants.GAME_SEED, self.game_map.width, self.game_map.height, p)
+            self.telemetry.map(self.game_map.halite)
+
+        if args.record:
+            recorder = snapshot.GameRecorder(self.game)
+            self.game.subscribe(recorder.record_frame)
+            # The game ends when the engine closes stdin, so the recording is written on the way out
+            atexit.register(recorder.save, args.record.format(self.game.my_id), {'q': list(self.q)})
 
     def write_state(self):
-        '''Create two files - save_state contains human-readable details about the game state, while pickle_state contains a pickled copy of the game state.'''
-        with open("save_states/save_state id%s round%s %s" % (self.game.my_id, self.game.turn_number, int(time.time())),'w') as save_file:
-            map_array = [
-                        [self.game_map[Position(x,y)].halite_amount for x in range(self.game_map.width)] for y in range(self.game_map.height)
-                        ]
-            save_file.write("Map: %s\n" % (str(json.dumps(map_array))))
+        '''Create two files - save_state contains human-readable details about the game state, while the .npz snapshot (see hlt.snapshot) can be loaded by perform_test.'''
+        name = "id%s round%s %s" % (self.game.my_id, self.game.turn_number, int(time.time()))
+        with open("save_states/save_state %s" % name,'w') as save_file:
+            save_file.write("Map: %s\n" % (str(json.dumps(self.game_map.halite.tolist()))))
             save_file.write("q: %s\n" % (str(self.q)))
             save_file.write("Halite: %s\n" % (self.game.me.halite_amount))
             ship_data = [(ship.id, ship.position.x, ship.position.y, ship.halite_amount) for ship in self.game.me.get_ships()]
             save_file.write("Ships: %s\n" % (str(json.dumps(ship_data))))
-        
-        with open("save_states/pickle_state id%s round%s %s" % (self.game.my_id, self.game.turn_number, int(time.time())),'wb') as pickle_file:
-            pickle.dump([self.game, self.q, self.CONSTANTS], pickle_file)
 
-    def perform_test(self, pickled_file):
-        """Run one turn of the bot starting from the game state in pickled_file.
-        
-        :param pickled_file: a previously-pickled copy of [self.game, self.q, self.CONSTANTS] from an actual game run.
+        snapshot.save_snapshot(self.game, "save_states/snapshot %s.npz" % name, {'q': list(self.q)})
+
+    def perform_test(self, state_file, turn=None):
+        """Run one turn of the bot starting from a saved game state.
+
+        :param state_file: a snapshot or recording written by hlt.snapshot (.npz), or a legacy pickled copy of [self.game, self.q, self.CONSTANTS] from an actual game run.
+        :param turn: for recordings, the turn to start from. Defaults to the last recorded turn.
 
         :return: command_queue developed over the turn.
         """
-        with open(pickled_file, 'rb') as pickled_state:
-            state = pickle.load(pickled_state)
-        
-        self.game = state[0]
+        if state_file.endswith('.npz'):
+            self.game, metadata = snapshot.load_game(state_file, turn)
+            self.q = tuple(metadata['q'])
+            self.CONSTANTS = read_constants()
+        else:
+            self.load_pickled_state(state_file)
+
         self.game_map = self.game.game_map
         self.me = self.game.me
         self.ships = self.me.get_ships()
+        return self.one_game_step()
+
+    def load_pickled_state(self, pickled_file):
+        """Load a game state pickled by earlier versions of write_state, and load its constants into hlt.constants.
+
+        :param pickled_file: a previously-pickled copy of [self.game, self.q, self.CONSTANTS] from an actual game run.
+        """
+        with open(pickled_file, 'rb') as pickled_state:
+            state = pickle.load(pickled_state)
+
+        self.game = state[0]
         self.q = state[1]
         self.CONSTANTS = state[2]
 
@@ -195,17 +196,17 @@ class FlinkBot():
             'INSPIRED_MOVE_COST_RATIO': self.CONSTANTS['INSPIRED_MOVE_COST_RATIO']
         }
         hlt.constants.load_constants(CONSTANTS_RENAMED_FOR_IMPORT)
-        
-        return self.one_game_step()
 
     def determine_personality_parameters(self, game_map):
         '''Determine a number between 0 and 1 for each of the personality parameters.
         
-        Presently, this is grabbed from system arguments when the bot is called, but the intention is for a trained machine-learning bot to read the map and choose optimal parameters.'''
+        Presently, this is given to FlinkBot() or grabbed from system arguments when the bot is called, but the intention is for a trained machine-learning bot to read the map and choose optimal parameters.'''
         # TODO: game_map is not currently used. The intention is to train a machine learning algorithm to determine these parameters from the game map.
         # TODO: Consider adding p[3] = cap on last round to make ships
         # TODO: Add halite depleted on turn 400; linear interpolation between two
         
+        if self.params is not None:
+            return self.params
         return args.p
 
     def ready(self):
@@ -214,13 +215,21 @@ class FlinkBot():
         '''
         self.game.ready("FlinkBot")
 
-        sc_log(1, "Successfully created FlinkBot! My Player ID is {}.".format(self.game.my_id))
+        sc_log(1, "Successfully created FlinkBot! My Player ID is %s.", self.game.my_id)
 
     def update(self):
         '''Pull updated game state data from the game and update class variables.'''
         self.game.update_frame() # pull updated data
         self.me = self.game.me
         self.ships = self.me.get_ships()
+        self.timing = {'update': self.game.scheduler.elapsed()}
+
+        if self.telemetry is not None:
+            changes = self.game.changes
+            new_structures = {structure.position for structure in changes.new_structures}
+            for ship in changes.destroyed_ships:
+                if ship.owner == self.game.my_id and ship.position not in new_structures:
+                    self.telemetry.collision(self.game.turn_number, ship.id, ship.position)
 
     def submit(self, command_queue):
         '''Submit the completed command queue.
@@ -231,127 +240,141 @@ class FlinkBot():
 
     def one_game_step(self):
         '''Determine and return the command_queue actions to take this turn.'''
-        sc_log(1, f"##FL-Round:{self.game.turn_number}:{self.game.me.halite_amount}")
-
-        command_queue = []
-
-        #TODO: Consider enemy positions when choosing to move
-        #      If you can't grab a list of their positions, spiral_walk until you find the closest.
-        for ship in self.ships:
-            if ship.id not in read_moved_ships(command_queue):
-                command_queue = self.move_ship_recursive(command_queue, ship, [])
-
-        if self.me.halite_amount >= self.CONSTANTS['SHIP_COST'] and self.me.shipyard.position not in read_committed_positions(self.ships, command_queue) and len(self.ships) <= self.q[2]:
+        sc_log(1, "##FL-Round:%s:%s", self.game.turn_number, self.game.me.halite_amount)
+
+        scheduler = self.game.scheduler
+        command_queue = self.game.command_queue()
+        scheduler.offer(self.safe_plan())
+        phase_start = scheduler.elapsed()
+        self.rank_moves()
+        self.timing['targeting'] = scheduler.elapsed() - phase_start
+
+        #TODO: Consider enemy positions when choosing targets
+        #      move_preferences only keeps ships off cells an enemy ship is on; the target index could steer around them.
+        phase_start = scheduler.elapsed()
+        self.resolve_moves(command_queue)
+        scheduler.offer(command_queue.to_commands())
+        self.timing['resolution'] = scheduler.elapsed() - phase_start
+
+        if self.me.halite_amount >= self.CONSTANTS['SHIP_COST'] and not command_queue.is_committed(self.me.shipyard.position) and len(self.ships) <= self.q[2]:
             sc_log(2, "Generating new ship.")
-            command_queue.append(self.me.shipyard.spawn())
+            command_queue.spawn(self.me.shipyard)
 
-        sc_log(1, f"Command queue: {str(command_queue)}")
+        sc_log(1, "Command queue: %s", command_queue)
+        if self.telemetry is not None:
+            self.timing['total'] = scheduler.elapsed()
+            self.telemetry.turn(self.game.turn_number, self.me.halite_amount, len(self.ships), len(self.me.get_dropoffs()), self.timing)
         return command_queue
 
-    def move_ship_recursive(self, command_queue, ship, ignore_ships):
-        '''Determine ship movement, recursively deferring to a ship in its path and ignoring ships that are confirmed to move elsewhere.'''
-        sc_log(1, f"Move_ship_recursion start: Ship {ship.id}")
-
-        moved = False
-        loopcounter = 0 # Infinite loops terrify me, so loopcounter has a max of 10, which should never occur. (Actual max 5)
-        while not moved and loopcounter < 10:
-            # Check for the ship's desired move, considering that it can't go to any committed positions
-            move_direction, move_position = self.desired_move(ship, command_queue)
-            sc_log(1, "Move_ship_recursion: Ship {ship.id} considering direction {move_direction} position {move_position}")
-            # Collisions are only possible with ships meeting the following criteria:
-            # (1) has not moved yet and (2) is currently on the target space
-            #  - Ships after this ship won't target this target because it will be in the command queue once this ship commits
-            #  - and this ship couldn't have targeted this space if another ship committed to staying still in it.
-            # (3) is not higher in the recursive chain than this ship
-            #  - you know any ship higher up the chain wants to move from its spot
-            # To resolve this, check every ship for these three criteria
-            no_ships_on_target = True
-            for other_ship in self.ships:
-                if ship.id != other_ship.id and other_ship.position == move_position and other_ship.id not in ignore_ships and other_ship.id not in read_moved_ships(command_queue):
-                    sc_log(1, f"Move_ship_recursion: Ship {ship.id} blocked by {other_ship}. Letting it go first.")
-                    # If one is found, let it move first, ignoring this ship (criteria (3) above)
-                    ignore_ships_copy = [iship for iship in ignore_ships]
-                    ignore_ships_copy.append(ship.id)
-                    command_queue = self.move_ship_recursive(command_queue, other_ship, ignore_ships_copy)
-                    # If that ship (or its down-chain friends) decided to commit this spot,
-                    #   we need to restart the while loop and desired_move elsewhere.
-                    if move_position in read_committed_positions(self.ships, command_queue):
-                        no_ships_on_target = False
-                        break
-
-            # If, after looking at all other ships, none meet the criteria and want to stay, we can commit the move.
-            if no_ships_on_target:
-                if move_direction == "stay":
-                    sc_log(1, f"Move_ship_recursion: Ship {ship.id} decided to stay at {ship.position}")
-                    command_queue.append(ship.stay_still())
-                else:
-                    sc_log(1, f"Move_ship_recursion: Ship {ship.id} decided to move {move_direction} to {move_position}")
-                    command_queue.append(ship.move(move_direction)) 
-                moved = True
-            
-            loopcounter += 1
-        
-        # As above, if the while loop goes way beyond where it should, fail gracefully and log.
-        if not moved:
-            sc_log(1, f"FLWarning:Ship {ship.id} could not find a target in 10 checks")
-            command_queue.append(ship.stay_still())
+    def safe_plan(self):
+        '''A cheap, collision-free plan for the turn scheduler to fall back on if planning runs out of time.
 
-        return command_queue
+        Every ship mines in place, except a ship on the shipyard, which steps onto the first neighbouring cell with no ship on it so the shipyard stays clear.
+        Returns engine command strings.'''
+        occupancy = self.game.occupancy
+        shipyard = self.me.shipyard.position
+        for ship in self.ships:
+            if ship.position != shipyard:
+                continue
+            for direction in Direction.get_all_cardinals():
+                position = ship.position.directional_offset(direction)
+                if occupancy.own_ship_at(position) is None and occupancy.enemy_ship_at(position) is None:
+                    return ["{} {} {}".format(commands.MOVE, ship.id, Direction.convert(direction))]
+        return []
+
+    def rank_moves(self):
+        '''Determine every ship's target, and score each of its moves by the cheapest path (in halite burned) left to that target.
+
+        Ties between equally cheap paths go to the move that leaves the ship closest to its target, measured for the whole fleet at once.
+        Only ships returning to a shipyard or dropoff use path costs; ships heading to mining targets are scored on distance alone.
+        Ships nearest to rich halite pick their targets first, so a ship already sitting on a rich cell keeps it.
+        Both stages stop at the turn scheduler's soft deadline: ships left without a target stay put, and ships left without path costs go the short way.
+        Populates self.targets (ship id: target position) and self.move_options (ship id: (current score, [(score, direction, position) for each cardinal])).'''
+        self.target_index = TargetIndex(self.game_map, self.q[0])
+        fleet = PositionArray.from_entities(self.ships)
+        targets = [None] * len(self.ships)
+        planning = True
+        for i in sorted(range(len(self.ships)), key=lambda i: self.target_index.distance(self.ships[i].position)):
+            planning = planning and self.game.scheduler.checkpoint("targeting")
+            targets[i] = self.determine_target(self.ships[i]) if planning else self.ships[i].position
+        target_array = PositionArray.from_positions(targets)
+
+        current_distances = dist_betw_positions(self.game_map, fleet, target_array).tolist()
+        offsets = fleet.cardinal_offsets()
+        option_distances = [dist_betw_positions(self.game_map, offset, target_array).tolist() for offset in offsets]
+
+        self.targets = {}
+        self.move_options = {}
+        for i, (ship, target) in enumerate(zip(self.ships, targets)):
+            planning = planning and self.game.scheduler.checkpoint("pathfinding")
+            if planning and self.me.distance_to_deposit(target) == 0:
+                # Ships heading to the same shipyard or dropoff all share one cached path tree.
+                path_costs = {direction: cost for cost, direction, _ in self.game_map.path_finder.tree(target).rank_moves(ship.position)}
+            else:
+                # Mining targets are re-chosen every turn, so a detour just moves the target; these go the short way.
+                path_costs = dict.fromkeys(Direction.get_all_cardinals() + [Direction.Still], 0)
+            self.targets[ship.id] = target
+            self.move_options[ship.id] = (
+                (path_costs[Direction.Still], current_distances[i]),
+                [((path_costs[option], option_distances[o][i]), option, offsets[o][i]) for o, option in enumerate(Direction.get_all_cardinals())]
+            )
+
+    def resolve_moves(self, command_queue):
+        '''Choose a collision-free move for the whole fleet at once and queue it.
+
+        Each ship ranks its moves (see move_preferences); hlt.assignment.assign_moves finds the assignment with the lowest total rank where no two ships end on the same cell.'''
+        preferences = {}
+        for ship in self.ships:
+            preferences[ship.id] = [(rank, self.game_map.cell_index(position), direction)
+                                    for rank, (direction, position) in enumerate(self.move_preferences(ship))]
+        moves = assign_moves(preferences)
+        for ship in self.ships:
+            sc_log(2, "- - Next step for ship %s is %s", ship.id, moves[ship.id])
+            command_queue.move(ship, moves[ship.id])
+
+    def move_preferences(self, ship):
+        '''List the moves the given ship would accept, best first, as (direction, position) pairs. Staying still is always last.
 
-    def desired_move(self, ship, command_queue):
-        '''Determine the move which gets the given ship closest to its desired target, forbidding claimed spaces in the command_queue.'''
-        committed_positions = read_committed_positions(self.ships, command_queue)
-        on_shipyard = (self.me.shipyard.position == ship.position)
-        sc_log(3, f"Invalid Positions: {str(committed_positions)}")
-        sc_log(2, "- Checking desired move for ship {}.".format(ship.id))
+        Only moves scoring better than staying are listed, except on the shipyard, where ships move off unless every cardinal is taken.
+        Moves onto a cell an enemy ship is on are never listed.'''
         position = ship.position
-        target = self.determine_target(ship)
+        occupancy = self.game.occupancy
+        target = self.targets[ship.id]
+        current_score, options = self.move_options[ship.id]
+        stay = [(Direction.Still, position)]
 
         if ship.halite_amount < self.game_map[ship.position].halite_amount*0.1 or position == target:
-            return ("stay", position)
+            return stay
 
-        sc_log(2, f"- - Desired move for ship {ship.id} is {str(target)}.")
-        move_order = "stay"
-        destination = position
-        if on_shipyard:
-            best_distance = 1000 # insist that ships move off the shipyard unless impossible
+        sc_log(2, "- - Desired move for ship %s is %s.", ship.id, target)
+        if self.me.shipyard.position == position:
+            better = options
         else:
-            best_distance = dist_betw_positions(position, target)
-
-        options = [Direction.North, Direction.South, Direction.East, Direction.West]
-
-        for option in options:
-            offset_pos = position +Position(option[0], option[1])
-            diagonal_distance = dist_betw_positions(offset_pos, target)
-            if diagonal_distance < best_distance and offset_pos not in committed_positions:
-                move_order = option
-                destination = offset_pos
-                best_distance = diagonal_distance
-
-        sc_log(2, f"- - Next step for ship {ship.id} is {str(move_order)} to {str(destination)}")        
-        return (move_order, destination)
+            better = [option for option in options if option[0] < current_score]
+        better = [option for option in better if occupancy.enemy_ship_at(option[2]) is None]
+        return [(option, offset_pos) for score, option, offset_pos in sorted(better, key=lambda option: option[0])] + stay
 
     def determine_target(self, ship):
-        '''Determine where the ship wants to end up, based on its current status and the map.'''
+        '''Determine where the ship wants to end up, based on its current status and the map.
+
+        Side effect: a mining target is claimed in self.target_index, so the next ship to ask is sent elsewhere. Call it once per ship per turn.'''
         # If ship is full or (ship is on a drained square and carrying lots of halite)
         if ship.halite_amount == self.CONSTANTS['MAX_HALITE'] or (ship.halite_amount > self.q[1] and self.game_map[ship.position].halite_amount < self.q[0]):
-            sc_log(3, f"- - Target for ship {ship.id} is shipyard.")
-            return self.me.shipyard.position
-        else:
-            cells_searched = 0
-            for search_position in spiral_walk(ship.position.x, ship.position.y):
-                sc_log(3, f"- - - Checking search position {str(search_position)} with {self.game_map[search_position].halite_amount} halite.")
-                if self.game_map[search_position].halite_amount >= self.q[0]:
-                    sc_log(3, f"- - - Target for ship {ship.id} is {str(search_position)}")
-                    return search_position
-
-                # If there is insufficient halite on the map (very high threshold for depleted), stop.
-                cells_searched += 1
-                if cells_searched > 4*max(self.CONSTANTS['WIDTH'], self.CONSTANTS['HEIGHT'])**2: # this is worst-case of sitting in a corner
-                    sc_log(1, f"??? Search found insufficient halite on map - ordering ship not to move.")
-                    return ship.position    
+            sc_log(3, "- - Target for ship %s is nearest shipyard or dropoff.", ship.id)
+            return self.me.nearest_deposit(ship.position)
+        target = self.target_index.nearest_target(ship.position)
+        if target is None:
+            # If there is insufficient halite on the map (very high threshold for depleted), stop.
+            sc_log(1, "??? Search found insufficient halite on map - ordering ship not to move.")
+            return ship.position
+        sc_log(3, "- - - Target for ship %s is %s", ship.id, target)
+        self.target_index.claim(target)
+        return target
 
 if __name__ == "__main__":
+    args = parser.parse_args()
+    logging_level = args.l
+
     flink_bot = FlinkBot()
     flink_bot.start_game() # Initializes, runs hlt.Game() and starts X minute timer to do pre-processing
     flink_bot.ready() # Readying starts 2-second turn timer phase
@@ -365,6 +388,6 @@ if __name__ == "__main__":
             # Submit commands
             flink_bot.submit(command_queue)
         except Exception:
-            if args.pickle:
+            if args.snapshot:
                 flink_bot.write_state()
             raise
@@ -0,0 +1,189 @@
+# Python 3.6
+
+'''A SQLite store of every match played through MatchRunner, so sweeps and optimize() survive restarts and never replay a match.
+
+Each match is keyed by the bot's version (a hash of the bot and engine sources), its p values, map size, seed and, for
+subprocess matches, the bot commands. ResultStore.run_matches takes MatchSpecs like MatchRunner.run_matches, but answers
+specs from the store when it can, and records each new match the moment it finishes:
+
+    store = ResultStore("results.sqlite")
+    records = store.run_all([MatchSpec(params=(0.5, 0.5, 0.5), seed=seed) for seed in range(10)])
+
+A spec with a seed reuses the stored match with that seed. A spec without a seed (a random map) reuses any stored match
+with the same key apart from the seed, each at most once per call, so "5 repeats" only plays the repeats not already stored.
+'''
+
+import glob
+import hashlib
+import json
+import os
+import sqlite3
+import time
+
+import MatchRunner
+
+LOCATION = os.path.dirname(os.path.abspath(__file__))
+
+# The sources whose behaviour a stored result depends on
+VERSION_FILES = ('MyBot.py', 'EmptyBot.py', 'LocalEngine.py', os.path.join('hlt', '*.py'))
+# ... and for BatchEngine games, which are stored with bots = BATCH
+BATCH_VERSION_FILES = ('BatchEngine.py', 'LocalEngine.py')
+BATCH = 'BatchEngine'
+
+_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS matches (
+    id INTEGER PRIMARY KEY,
+    bot_version TEXT NOT NULL,
+    params TEXT NOT NULL,
+    width INTEGER NOT NULL,
+    height INTEGER NOT NULL,
+    seed INTEGER NOT NULL,
+    bots TEXT NOT NULL,
+    best INTEGER,
+    scores TEXT,
+    turns INTEGER,
+    collisions TEXT,
+    eliminated TEXT,
+    elapsed REAL,
+    created REAL
+);
+CREATE INDEX IF NOT EXISTS matches_key ON matches (bot_version, params, width, height, bots, seed);
+'''
+
+_versions = {}
+
+
+def bot_version(files=VERSION_FILES):
+    '''A short hash of the bot and engine sources (VERSION_FILES), so results from an older bot are never mixed in.'''
+    if files not in _versions:
+        digest = hashlib.sha1()
+        for pattern in files:
+            for filename in sorted(glob.glob(os.path.join(LOCATION, pattern))):
+                digest.update(os.path.relpath(filename, LOCATION).replace(os.sep, '/').encode())
+                with open(filename, 'rb') as source:
+                    digest.update(source.read())
+        _versions[files] = digest.hexdigest()[:12]
+    return _versions[files]
+
+
+def batch_version():
+    '''bot_version for BatchEngine games: a hash of BATCH_VERSION_FILES.'''
+    return bot_version(BATCH_VERSION_FILES)
+
+
+def params_key(params):
+    '''p values as stored: a JSON list rounded to 6 places, so equal vectors match whatever their type.'''
+    return json.dumps([round(float(p), 6) for p in params])
+
+
+def bots_key(spec):
+    '''The bot commands of a subprocess spec as stored, or '' for in-process matches.'''
+    return json.dumps(list(spec.bots)) if spec.bots is not None else ''
+
+
+class ResultStore:
+    '''A SQLite file of match results. Only the process that opened it should write to it (MatchRunner's workers never do).'''
+    def __init__(self, filename=os.path.join(LOCATION, 'results.sqlite'), version=None):
+        '''
+        :param version: The bot version results are stored and looked up under. Defaults to bot_version().
+        '''
+        self.filename = filename
+        self.version = version or bot_version()
+        self.connection = sqlite3.connect(filename)
+        self.connection.executescript(_SCHEMA)
+
+    def close(self):
+        self.connection.close()
+
+    def add(self, record):
+        '''Store a MatchRecord from a successful match (ones with an error are not stored).'''
+        if record.error:
+            return
+        spec = record.spec
+        with self.connection:
+            self.connection.execute(
+                'INSERT INTO matches (bot_version, params, width, height, seed, bots, best, scores, turns, collisions, eliminated, elapsed, created) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                (self.version, params_key(spec.params), spec.width, spec.height, record.seed, bots_key(spec), record.best,
+                 json.dumps(record.scores), record.turns, json.dumps(record.collisions), json.dumps(record.eliminated),
+                 record.elapsed, time.time()))
+
+    def _find(self, spec, exclude):
+        '''The first stored row for spec (any seed if spec.seed is None) whose id is not in exclude, or None.'''
+        query = ('SELECT id, seed, best, scores, turns, collisions, eliminated, elapsed FROM matches '
+                 'WHERE bot_version = ? AND params = ? AND width = ? AND height = ? AND bots = ?')
+        arguments = [self.version, params_key(spec.params), spec.width, spec.height, bots_key(spec)]
+        if spec.seed is not None:
+            query += ' AND seed = ?'
+            arguments.append(spec.seed)
+        for row in self.connection.execute(query + ' ORDER BY id', arguments):
+            if row[0] not in exclude:
+                return row
+        return None
+
+    def run_matches(self, specs, workers=None, root=None, keep_files=False):
+        '''MatchRunner.run_matches, answering specs from the store where possible and storing every new match as it finishes.
+        Stored results are yielded first, with workdir None.'''
+        specs = list(specs)
+        # Stored rows already handed to an unseeded spec in this call; a seeded spec may reuse its row any number of times
+        used = set()
+        seeded_rows = {}
+        missing = []
+        # Specs with the same seed as an earlier missing spec wait for its match instead of playing it again
+        duplicates = {}
+        first_missing = {}
+        for index, spec in enumerate(specs):
+            key = (params_key(spec.params), spec.width, spec.height, bots_key(spec), spec.seed)
+            if spec.seed is None:
+                row = self._find(spec, used)
+            else:
+                if key not in seeded_rows:
+                    seeded_rows[key] = self._find(spec, ())
+                row = seeded_rows[key]
+            if row is None:
+                if spec.seed is not None and key in first_missing:
+                    duplicates.setdefault(first_missing[key], []).append(index)
+                    continue
+                first_missing[key] = index
+                missing.append(index)
+                continue
+            if spec.seed is None:
+                used.add(row[0])
+            match_id, seed, best, scores, turns, collisions, eliminated, elapsed = row
+            yield MatchRunner.MatchRecord(index, spec, seed, json.loads(scores), best, turns, json.loads(collisions),
+                                          json.loads(eliminated), elapsed, None, None)
+
+        if not missing:
+            return
+        for record in MatchRunner.run_matches([specs[index] for index in missing], workers, root, keep_files):
+            self.add(record)
+            index = missing[record.index]
+            yield record._replace(index=index)
+            for duplicate in duplicates.get(index, []):
+                yield record._replace(index=duplicate, spec=specs[duplicate])
+
+    def run_all(self, specs, workers=None, root=None, keep_files=False):
+        '''run_matches, collected into a list in the order of specs.'''
+        return sorted(self.run_matches(specs, workers, root, keep_files), key=lambda record: record.index)
+
+    def batch_best(self, params, seed, width=32, height=32):
+        '''The stored best halite of a BatchEngine game, or None. Look these up through a store opened with version=batch_version().'''
+        row = self.connection.execute(
+            'SELECT best FROM matches WHERE bot_version = ? AND params = ? AND width = ? AND height = ? AND bots = ? AND seed = ? ORDER BY id',
+            (self.version, params_key(params), width, height, BATCH, seed)).fetchone()
+        return row[0] if row else None
+
+    def add_batch(self, params, seed, best, width=32, height=32):
+        '''Store the best halite of a BatchEngine game.'''
+        with self.connection:
+            self.connection.execute(
+                'INSERT INTO matches (bot_version, params, width, height, seed, bots, best, created) VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                (self.version, params_key(params), width, height, seed, BATCH, best, time.time()))
+
+    def results(self, width=32, height=32, in_process=True):
+        '''Every stored (p values, best halite) for the current bot version and map size, oldest first.
+        :param in_process: Only matches played in-process (True), or only subprocess ones (False)'''
+        query = ('SELECT params, best FROM matches WHERE bot_version = ? AND width = ? AND height = ? AND '
+                 + ("bots = ''" if in_process else "bots NOT IN ('', ?)") + ' ORDER BY id')
+        arguments = (self.version, width, height) if in_process else (self.version, width, height, BATCH)
+        return [(tuple(json.loads(params)), best) for params, best in self.connection.execute(query, arguments)]
@@ -1,8 +1,6 @@
 import os
-#https://cmdlinetips.com/2014/03/how-to-run-a-shell-command-from-python-and-get-the-output/
-import subprocess
-#https://stackoverflow.com/questions/4760215/running-shell-command-and-capturing-the-output
-import json
+import shutil
+import tempfile
 from statistics import stdev, mean
 import itertools
 import matplotlib.pyplot as plt
@@ -10,77 +8,110 @@ import time
 import math
 import random
 import MyBot
+import EmptyBot
 import EGO
+import LocalEngine
+import BatchEngine
+import MatchRunner
+import ResultStore
 import numpy as np
+from hlt import telemetry
 
 def call_halite(width=32,
                 height=32,
-                bot1="MyBot.py",
-                bot2="EmptyBot.py",
+                p_values=(0.5, 0.5, 0.5),
                 replaying=False,
-                delete_logs=True):
-    if replaying:
-        replay_text = ""
-    else:
-        replay_text = "--no-replay"
-
-    location = 'C:\\Users\\Swift-PC\\Desktop\\CodingProjects\\Halite\\'
-    command = f'{location}halite.exe -i replays {replay_text} --width {width} --height {height} "python {location}{bot1}" "python {location}{bot2}"'
-
-    executed = subprocess.run(command, stderr=subprocess.PIPE, universal_newlines=True, shell=True)
-    
-    collisions = 0
-    for line in executed.stderr.split("\n"):
-        if line.find("[info] Map seed is") >= 0:
-            seed_string = line[18:]
-            seed = int(seed_string)
-        if line.find("[P0]") >= 0 and line.find("collided") >= 0:
-            collisions += 1
-
-    halite_amounts = []
-    with open(f"bot-0.log", 'r') as log_file:
-        for line in log_file:
-            if line.find("##FL-Map") >= 0:
-                game_map_string = line.split(":")[3]
-                game_map = json.loads(game_map_string)
-            if line.find("##FL-Round") >= 0:
-                halite_amount_strings = line.split(":")
-                halite_amounts.append([int(halite_amount_strings[3]),int(halite_amount_strings[4])])
-    if delete_logs:    
-        os.remove("bot-0.log")
-        os.remove("bot-1.log")
-
-    return {'map':game_map,'halite':halite_amounts, 'seed':seed, 'collisions':collisions, 'stderr':executed.stderr}
-
-def scan_pvalues(repeats=5, *args):
+                delete_logs=True,
+                seed=None):
+    '''Play MyBot.py against EmptyBot.py as subprocesses in a match directory of their own (see MatchRunner), and read MyBot's telemetry.
+    With delete_logs=False the directory (bot logs, telemetry, and replay-0.npz if replaying) is kept, and returned as 'workdir'.'''
+    # LocalEngine writes no replays of its own; MyBot records the game as seen by player 0 instead (see hlt.snapshot)
+    bot1_command = MatchRunner.flinkbot_command(p_values, telemetry=True, record="replay-{}.npz" if replaying else None)
+    spec = MatchRunner.MatchSpec(p_values, width, height, seed, bots=[bot1_command, MatchRunner.emptybot_command()])
+    root = tempfile.mkdtemp(prefix="halite-")
+    record, = MatchRunner.run_all([spec], workers=1, root=root, keep_files=True)
+    if record.error:
+        raise RuntimeError(record.error)
+
+    # MyBot writes its results to telemetry-<player id>.jsonl instead of them being scraped from its log
+    game = telemetry.read_game(os.path.join(record.workdir, "telemetry-0.jsonl"))
+    halite_amounts = np.column_stack((game.turns, game.halite)).tolist()
+    if delete_logs:
+        shutil.rmtree(root, ignore_errors=True)
+
+    return {'map':game.map.tolist(),'halite':halite_amounts, 'seed':record.seed, 'collisions':record.collisions[0], 'record':record, 'telemetry':game,
+            'workdir':None if delete_logs else record.workdir}
+
+def call_in_process(p_values, width=32, height=32, seed=None):
+    '''Play FlinkBot with the given p values against EmptyBot inside this process (see LocalEngine.run_in_process).
+    Much faster than call_halite, but writes no logs, telemetry or replays.
+    Returns (best halite FlinkBot held on any turn, the MatchResult).'''
+    result = LocalEngine.run_in_process([MyBot.FlinkBot(list(p_values)), EmptyBot.EmptyBot()], width, height, seed)
+    return max(turn[0] for turn in result.history), result
+
+# Where sweeps and optimize() keep every match they play (see ResultStore). None keeps nothing.
+RESULTS_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results.sqlite")
+
+def best_halite(specs, workers=None, results=RESULTS_FILE):
+    '''Run the MatchSpecs across MatchRunner's process pool, printing each result as it comes in.
+    With a results file, matches already in it are reused instead of played, and new ones are added to it as they finish.
+    Returns the best halite of each match, in the order of specs. Matches that failed are reported and count as None.'''
+    best = [None] * len(specs)
+    store = ResultStore.ResultStore(results) if results else None
+    try:
+        records = store.run_matches(specs, workers) if store else MatchRunner.run_matches(specs, workers)
+        for record in records:
+            if record.error:
+                print(f" - Match {record.index} {record.spec.params} failed:\n{record.error}")
+                continue
+            print(f" - {record.spec.params} on seed {record.seed}: best halite {record.best} ({record.elapsed:.1f}s)")
+            best[record.index] = record.best
+    finally:
+        if store:
+            store.close()
+    return best
+
+def scan_pvalues(repeats=5, *args, results=RESULTS_FILE):
     p_values = args
-    averages = []
-    for sample in itertools.product(*p_values): 
-        maxes = []
-        str_sample = ' '.join([str(item) for item in sample])
-        print(f"Calling Halite with p values: {str(sample)}")
-        for _ in range(repeats):
-            data = call_halite(bot1=f"MyBot.py 2 {str_sample}", delete_logs=False)
-            halite_data = data['halite']
-            max_round, max_halite = sorted(halite_data,key=lambda x:x[1], reverse=True)[0]
-            print(f" - Best halite was {max_halite} on round {max_round}")
-
-            maxes.append(max_halite)
-        averages.append([round(mean(maxes)), *sample])
+    samples = list(itertools.product(*p_values))
+    print(f"Calling Halite {repeats} times each with {len(samples)} sets of p values")
+    specs = [MatchRunner.MatchSpec(params=sample) for sample in samples for _ in range(repeats)]
+    best = best_halite(specs, results=results)
 
+    averages = []
+    for i, sample in enumerate(samples):
+        maxes = [value for value in best[i*repeats:(i+1)*repeats] if value is not None]
+        averages.append([round(mean(maxes)) if maxes else None, *sample])
     return averages
 
-def many_repeat_n_calls(n,z,p_values):
-    p_values_text = ' '.join([str(item) for item in p_values])
+def screen_pvalues(seeds, *args, results=RESULTS_FILE):
+    '''Like scan_pvalues, but plays every combination of p values on every seed at once with BatchEngine's approximation of FlinkBot.
+    Fast enough to screen thousands of combinations; confirm the best few with scan_pvalues.
+    Games already in the results file (under BatchEngine's own version) are reused; only the rest are played, in one batch.'''
+    samples = list(itertools.product(*args))
+    games = [(sample, seed) for sample in samples for seed in seeds]
+    store = ResultStore.ResultStore(results, version=ResultStore.batch_version()) if results else None
+    try:
+        best = [store.batch_best(sample, seed) if store else None for sample, seed in games]
+        missing = [i for i, value in enumerate(best) if value is None]
+        if missing:
+            result = BatchEngine.run_batch([games[i][0] for i in missing], [games[i][1] for i in missing])
+            for i, value in zip(missing, result.history.max(axis=0).tolist()):
+                best[i] = value
+                if store:
+                    store.add_batch(games[i][0], games[i][1], value)
+    finally:
+        if store:
+            store.close()
+    return [[round(mean(best[i*len(seeds):(i+1)*len(seeds)])), *sample] for i, sample in enumerate(samples)]
+
+def many_repeat_n_calls(n,z,p_values,results=RESULTS_FILE):
+    specs = [MatchRunner.MatchSpec(params=tuple(p_values), tag=i) for i in range(z) for _ in range(n)]
+    best = best_halite(specs, results=results)
     averages = []
     for i in range(z):
         print("Loop {}".format(i))
-        maxes = []
-        for _ in range(n):
-            data = call_halite(bot1=f"MyBot.py 2 {p_values_text}", delete_logs=False)
-            halite_data = data['halite']
-            _, max_halite = sorted(halite_data,key=lambda x:x[1], reverse=True)[0]
-            maxes.append(max_halite)
+        maxes = [value for spec, value in zip(specs, best) if spec.tag == i and value is not None]
         print(" - Maxes: {}".format(maxes))
         print(" - Mean: {}".format(mean(maxes)))
         averages.append(mean(maxes))
@@ -108,55 +139,70 @@ def run_test(state_file_name):
     bot = MyBot.FlinkBot()
     return bot.perform_test(state_file_name)
 
-def optimize():
+def optimize(workers=None, kind='ei', strategy='kriging_believer', results=RESULTS_FILE):
+    '''Search p values with EGO, playing a batch of matches at a time.
+    Each round EGO proposes one point per worker (see EGO.propose_batch, which takes kind and strategy), they are played in parallel, and the kernel is refitted.
+    Every match is kept in the results file, and a restarted search picks up from the matches already there for the current bot version.'''
+    workers = workers or os.cpu_count() or 1
     with open('Halite\optimize.log','w') as logfile:
-        # Setup
+        # Setup. These are only starting guesses: predictor.fit() refits the kernel's scale, each dimension's theta and the noise as points come in.
         kernel = lambda r: np.exp(-0.5 * r**2)
         predictor = EGO.EGO(3, kernel, 0.1)
 
-        def call_halite_with_parameters(parameters):
-            bot_settings = "MyBot.py -p %s" % (" ".join([str(param) for param in parameters]))
-            logfile.write(bot_settings+"\n")
-            results = call_halite(bot1=bot_settings, delete_logs=False)
-            maximum = max([round[1] for round in results['halite']])
-            return maximum
-
-        starter_values = latin_hypercube(3)
-        #TODO: generates 4 starter values for 3 dimensions
-
-        for value_set in starter_values:
-            halite_result = call_halite_with_parameters(value_set)
-            print(f"Added point: {value_set} is {halite_result}")
-            predictor.add_point(halite_result, value_set)
+        def refit():
+            likelihood = predictor.fit()
+            if likelihood is None:
+                return
+            result_string = f"Fitted kernel: thetas {np.round(predictor.thetas, 3)}, noise {predictor.predicted_noise:.3g} (log likelihood {likelihood:.1f})"
+            print(result_string)
+            logfile.write(result_string+"\n")
 
-        one_dim = tuple(range(0, 10, 1))
-        sample_points = tuple(itertools.product(one_dim, one_dim, one_dim))
-        interp_x = np.asarray(sample_points) / 10 # the positions we predict at
+        def call_halite_with_parameters(*parameter_sets):
+            for parameters in parameter_sets:
+                logfile.write("MyBot.py -p %s\n" % (" ".join([str(param) for param in parameters])))
+            return best_halite([MatchRunner.MatchSpec(params=tuple(float(param) for param in parameters)) for parameters in parameter_sets], workers, results)
+
+        def add_points(parameter_sets):
+            for value_set, halite_result in zip(parameter_sets, call_halite_with_parameters(*parameter_sets)):
+                if halite_result is None:
+                    continue
+                result_string = f"Added point: {np.round(value_set, 3)} is {halite_result}"
+                print(result_string)
+                logfile.write(result_string+"\n")
+                predictor.add_point(halite_result, value_set)
+            refit()
+
+        if results:
+            store = ResultStore.ResultStore(results)
+            previous = store.results()
+            store.close()
+            for value_set, halite_result in previous:
+                if len(value_set) == 3 and halite_result is not None:
+                    predictor.add_point(halite_result, value_set)
+            if previous:
+                result_string = f"Resumed from {predictor.n} stored matches."
+                print(result_string)
+                logfile.write(result_string+"\n")
+                refit()
+
+        if predictor.n < 2:
+            starter_values = latin_hypercube(3)
+            #TODO: generates 4 starter values for 3 dimensions
+
+            # The starter points are independent, so they are played at the same time
+            add_points(starter_values)
 
         while True:
-            # predict the expected (interp_y) and std.dev. (interp_u) at each in interp_x/
-            interp_y, interp_u = predictor.generate_predictions(interp_x)
-
-            max_pos = np.argmax(interp_y+interp_u)
-            max_y_u = interp_x[max_pos, :]
-
-            max_pos = np.argmax(interp_u)
-            max_u = interp_x[max_pos, :]
-            max_u_val = interp_u[max_pos]
-
-            #TODO: It'll re-sample the same point a second time
-            #TODO: But the max_u for the point shouldn't be very high
-            #result_string = f"Best y+u: {max_y_u}. Sampling at {max_u} to explore ({max_u_val})."
-            result_string = f"Best y+u: {max_y_u}."
+            # Points already played are never proposed again, and each point of a batch is proposed as if the earlier ones had
+            # already come back, so the batch spreads out instead of piling onto the current best guess.
+            proposals = predictor.propose_batch(workers, kind, strategy)
+            best_x = predictor.x[np.argmax(predictor.y)]
+            result_string = f"Best so far: {np.round(best_x, 3)} ({np.max(predictor.y)}). Proposing {len(proposals)} points."
             print(result_string)
             logfile.write(result_string+"\n")
 
-            # actually calculate the real value associated with the prediction
-            halite_result = call_halite_with_parameters(max_y_u)
-            result_string = f"Added point: {max_y_u} is {halite_result}"
-            print(result_string)
-            logfile.write(result_string+"\n")
-            predictor.add_point(halite_result, max_y_u)
+            # actually calculate the real values associated with the proposals
+            add_points(proposals)
 
             # repeat. We know it's "good enough" when the answers converge about some x values.
 
@@ -176,8 +222,8 @@ if __name__ == "__main__":
     #     file.write(f"Time elapsed: {str(round(after-before))} seconds\n")
     #     file.write(pretty_sorted_averages)
 
-    #results = call_halite(bot1="MyBot.py -p 0.5 0.5 0.5", delete_logs=False)
-    #print(results['stderr'])
+    #results = call_halite(p_values=(0.5, 0.5, 0.5), delete_logs=False)
+    #print(results['result'])
 
     #print(many_repeat_n_calls(1,10,[0.5,0.5,0.5,0.5]))
 
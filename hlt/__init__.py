@@ -2,4 +2,5 @@
 
 from . import commands, entity, game_map, networking, constants
 from .networking import Game
+from .command_queue import CommandQueue
 from .positionals import Direction, Position
@@ -0,0 +1,88 @@
+import heapq
+
+
+def assign_moves(preferences):
+    """
+    Finds a collision-free move for every ship at once: each ship gets one of its options, no two ships end on the
+    same cell, and the total cost of the chosen options is as small as possible.
+
+    A minimum-cost bipartite matching between ships and cells. Every ship first takes its cheapest option if no
+    other ship has; each ship left over is then matched along a shortest augmenting path (Dijkstra with potentials
+    over the sparse ship-by-cell options), which may move earlier ships to their next-best cells.
+
+    :param preferences: {ship_id: [(cost, cell, move), ...]} for every ship. cell is any hashable key for the cell
+        the move ends on (e.g. its cell index). Every ship must include staying on its own cell, so that an
+        assignment always exists.
+    :return: {ship_id: move}
+    """
+    options = {ship_id: sorted(ship_options, key=lambda option: option[0]) for ship_id, ship_options in preferences.items()}
+    ship_potentials = {}
+    cell_potentials = {}
+    assigned = {}  # ship_id: option
+    cell_owners = {}  # cell: ship_id
+
+    unassigned = []
+    for ship_id, ship_options in options.items():
+        cost, cell, _ = ship_options[0]
+        ship_potentials[ship_id] = cost
+        if cell in cell_owners:
+            unassigned.append(ship_id)
+        else:
+            assigned[ship_id] = ship_options[0]
+            cell_owners[cell] = ship_id
+
+    for ship_id in unassigned:
+        _augment(ship_id, options, ship_potentials, cell_potentials, assigned, cell_owners)
+
+    return {ship_id: option[2] for ship_id, option in assigned.items()}
+
+
+def _augment(source, options, ship_potentials, cell_potentials, assigned, cell_owners):
+    """
+    Matches source along the cheapest augmenting path, keeping every reduced cost non-negative.
+    """
+    distances = {}  # settled cell: distance
+    predecessors = {}  # settled cell: (ship_id, option) that reached it
+    heap = []
+    counter = 0  # keeps heap entries comparable without comparing cells
+
+    def relax(ship_id, distance):
+        nonlocal counter
+        base = distance - ship_potentials[ship_id]
+        for option in options[ship_id]:
+            cell = option[1]
+            if cell not in distances:
+                heapq.heappush(heap, (base + option[0] - cell_potentials.get(cell, 0), counter, cell, ship_id, option))
+                counter += 1
+
+    relax(source, 0)
+    reached_ships = {source: 0}
+    while True:
+        distance, _, cell, ship_id, option = heapq.heappop(heap)
+        if cell in distances:
+            continue
+        distances[cell] = distance
+        predecessors[cell] = (ship_id, option)
+        owner = cell_owners.get(cell)
+        if owner is None:
+            end = cell
+            break
+        # The owner's matched edge has reduced cost 0, so it is reached at the same distance
+        reached_ships[owner] = distance
+        relax(owner, distance)
+
+    total = distances[end]
+    for ship_id, distance in reached_ships.items():
+        ship_potentials[ship_id] += total - distance
+    for cell, distance in distances.items():
+        cell_potentials[cell] = cell_potentials.get(cell, 0) - (total - distance)
+
+    cell = end
+    while True:
+        ship_id, option = predecessors[cell]
+        previous = assigned.get(ship_id)
+        assigned[ship_id] = option
+        cell_owners[cell] = ship_id
+        if ship_id == source:
+            break
+        cell = previous[1]
@@ -0,0 +1,101 @@
+from collections import namedtuple
+
+from . import commands
+from .positionals import Direction
+
+Move = namedtuple('Move', ['ship_id', 'direction', 'destination'])
+Spawn = namedtuple('Spawn', ['shipyard_id', 'destination'])
+Construct = namedtuple('Construct', ['ship_id', 'position'])
+
+
+class CommandQueue:
+    """
+    One turn's commands, kept as typed records until they are sent.
+
+    Alongside the records, the queue keeps the set of ship ids that already have a command, and records the
+    positions committed to (a ship's destination, or the shipyard for a spawn) in its Occupancy, so checking either
+    is a single lookup. Game.end_turn serializes the queue to the engine's format.
+    """
+    def __init__(self, occupancy):
+        """
+        :param occupancy: The frame's Occupancy, kept current as commands are queued (see Game.command_queue)
+        """
+        self.occupancy = occupancy
+        self.records = []
+        self.moved_ships = set()
+
+    def _claim_ship(self, ship):
+        if ship.id in self.moved_ships:
+            raise ValueError("Ship {} already has a command this turn".format(ship.id))
+        self.moved_ships.add(ship.id)
+
+    def _commit(self, record):
+        self.records.append(record)
+        self.occupancy.commit(record.destination, record)
+
+    def move(self, ship, direction):
+        """
+        Queues a move for ship without checking for collisions.
+        :param ship: The ship to move
+        :param direction: A Direction (Direction.Still to stay)
+        :return: The Move record
+        """
+        self._claim_ship(ship)
+        record = Move(ship.id, direction, ship.position.directional_offset(direction))
+        self._commit(record)
+        return record
+
+    def stay_still(self, ship):
+        """
+        Queues a command for ship to stay where it is.
+        :return: The Move record
+        """
+        return self.move(ship, Direction.Still)
+
+    def spawn(self, shipyard):
+        """
+        Queues a new ship at shipyard.
+        :return: The Spawn record
+        """
+        record = Spawn(shipyard.id, shipyard.position)
+        self._commit(record)
+        return record
+
+    def construct(self, ship):
+        """
+        Queues ship to be turned into a dropoff where it stands.
+        :return: The Construct record
+        """
+        self._claim_ship(ship)
+        record = Construct(ship.id, ship.position)
+        self.records.append(record)
+        return record
+
+    def is_committed(self, position):
+        """
+        :return: Whether a queued move or spawn ends at position
+        """
+        return self.occupancy.committed_to(position) is not None
+
+    def to_commands(self):
+        """
+        :return: The queue in the engine's string notation, in the order the records were queued
+        """
+        result = []
+        for record in self.records:
+            if isinstance(record, Move):
+                result.append("{} {} {}".format(commands.MOVE, record.ship_id, Direction.convert(record.direction)))
+            elif isinstance(record, Spawn):
+                result.append(commands.GENERATE)
+            else:
+                result.append("{} {}".format(commands.CONSTRUCT, record.ship_id))
+        return result
+
+    def __len__(self):
+        return len(self.records)
+
+    def __iter__(self):
+        return iter(self.records)
+
+    def __repr__(self):
+        return "{}({})".format(self.__class__.__name__, self.to_commands())
@@ -1,3 +1,8 @@
+import sys
+
+from . import log_pipeline
+
+
 # Placed here to avoid circular imports
 def read_input():
     """
@@ -7,5 +12,142 @@ def read_input():
     try:
         return input()
     except EOFError as eof:
-        logging.shutdown()
+        log_pipeline.shutdown()
         raise SystemExit(eof)
+
+
+class FrameReader:
+    """
+    Reads engine input in bulk from a byte stream (stdin's buffer by default).
+
+    Whatever the engine has written is pulled in with a single read call and split into
+    integers in one pass, so a whole turn is usually parsed from one or two system reads
+    instead of one input() call per line.
+    """
+    CHUNK_SIZE = 1 << 16
+
+    def __init__(self, stream=None):
+        self._stream = stream if stream is not None else sys.stdin.buffer
+        self._buffer = b""
+
+    @staticmethod
+    def for_stdin():
+        """
+        :return: A FrameReader over stdin, or a LineReader if stdin has no byte buffer (e.g. it was replaced)
+        """
+        if hasattr(sys.stdin, "buffer"):
+            return FrameReader(sys.stdin.buffer)
+        return LineReader()
+
+    def _fill(self):
+        """
+        Appends whatever the engine has sent so far to the buffer, exiting like read_input on EOF.
+        """
+        chunk = self._stream.read1(self.CHUNK_SIZE)
+        if not chunk:
+            log_pipeline.shutdown()
+            raise SystemExit(EOFError("EOF when reading engine input"))
+        self._buffer += chunk
+
+    def read_line(self):
+        """
+        :return: The next full line of input, without its line ending
+        """
+        end = self._buffer.find(b"\n")
+        while end < 0:
+            searched = len(self._buffer)
+            self._fill()
+            end = self._buffer.find(b"\n", searched)
+        line, self._buffer = self._buffer[:end], self._buffer[end + 1:]
+        return line.decode().rstrip("\r")
+
+    def read_ints(self, count):
+        """
+        Reads a flat run of integers, regardless of how they are split across lines.
+        :param count: How many integers to read
+        :return: A list of count integers
+        """
+        if count == 0:
+            return []
+        while True:
+            tokens = self._buffer.split(None, count)
+            # The last token is only complete if something (whitespace or another token) follows it
+            if len(tokens) > count or (len(tokens) == count and self._buffer[-1:].isspace()):
+                break
+            self._fill()
+        self._buffer = tokens[count] if len(tokens) > count else b""
+        return list(map(int, tokens[:count]))
+
+
+class LineReader:
+    """
+    Line-oriented fallback with the same interface as FrameReader, reading through read_input().
+    """
+    def __init__(self):
+        self._pending = []
+
+    def read_line(self):
+        """
+        :return: The next full line of input
+        """
+        return read_input()
+
+    def read_ints(self, count):
+        """
+        Reads a flat run of integers, one input line at a time.
+        :param count: How many integers to read
+        :return: A list of count integers
+        """
+        while len(self._pending) < count:
+            self._pending.extend(map(int, read_input().split()))
+        values, self._pending = self._pending[:count], self._pending[count:]
+        return values
+
+
+class ValueReader:
+    """
+    Reader with the same interface as FrameReader over values handed over in-process (e.g. by LocalEngine), so a
+    Game can be driven without any text being written or parsed.
+    """
+    def __init__(self):
+        self._lines = []
+        self._values = []
+        self._position = 0
+
+    def feed_line(self, line):
+        """
+        Queues a line to be returned by read_line (only the constants line is read as a line).
+        """
+        self._lines.append(line)
+
+    def feed(self, values):
+        """
+        Queues integers to be returned by read_ints.
+        :param values: An iterable of ints, in the order the engine would send them
+        """
+        if self._position:
+            del self._values[:self._position]
+            self._position = 0
+        self._values.extend(values)
+
+    def read_line(self):
+        """
+        :return: The next queued line. Exits like read_input if there is none.
+        """
+        if not self._lines:
+            log_pipeline.shutdown()
+            raise SystemExit(EOFError("No more input"))
+        return self._lines.pop(0)
+
+    def read_ints(self, count):
+        """
+        :param count: How many integers to read
+        :return: A list of count integers. Exits like read_input if fewer are queued.
+        """
+        end = self._position + count
+        if end > len(self._values):
+            log_pipeline.shutdown()
+            raise SystemExit(EOFError("No more input"))
+        values = self._values[self._position:end]
+        self._position = end
+        return values
@@ -13,12 +13,17 @@ def load_constants(constants):
     global EXTRACT_RATIO, MOVE_COST_RATIO
     global INSPIRATION_ENABLED, INSPIRATION_RADIUS, INSPIRATION_SHIP_COUNT
     global INSPIRED_EXTRACT_RATIO, INSPIRED_BONUS_MULTIPLIER, INSPIRED_MOVE_COST_RATIO
-    global WIDTH, HEIGHT
+    global WIDTH, HEIGHT, GAME_SEED
+
+    """The engine's map seed, if it sent one."""
+    GAME_SEED = constants.get('game_seed')
 
-    if 'map_width' in constants:
-        WIDTH = constants['map_width']
-    if 'map_height' in constants:
-        HEIGHT = constants['map_height']
+    """
+    The map size, if the engine sent it (otherwise set by set_dimensions once the map is read). Reset on every
+    load, so a game never sees the size of an earlier game played in the same process.
+    """
+    WIDTH = constants.get('map_width')
+    HEIGHT = constants.get('map_height')
 
     """The cost to build a single ship."""
     SHIP_COST = constants['NEW_ENTITY_ENERGY_COST']
@@ -66,6 +71,32 @@ def load_constants(constants):
     INSPIRED_MOVE_COST_RATIO = constants['INSPIRED_MOVE_COST_RATIO']
 
 
+def dump_constants():
+    """
+    The loaded constants in the engine's JSON format, so that load_constants(dump_constants()) restores them.
+    """
+    result = {
+        'NEW_ENTITY_ENERGY_COST': SHIP_COST,
+        'DROPOFF_COST': DROPOFF_COST,
+        'MAX_ENERGY': MAX_HALITE,
+        'MAX_TURNS': MAX_TURNS,
+        'EXTRACT_RATIO': EXTRACT_RATIO,
+        'MOVE_COST_RATIO': MOVE_COST_RATIO,
+        'INSPIRATION_ENABLED': INSPIRATION_ENABLED,
+        'INSPIRATION_RADIUS': INSPIRATION_RADIUS,
+        'INSPIRATION_SHIP_COUNT': INSPIRATION_SHIP_COUNT,
+        'INSPIRED_EXTRACT_RATIO': INSPIRED_EXTRACT_RATIO,
+        'INSPIRED_BONUS_MULTIPLIER': INSPIRED_BONUS_MULTIPLIER,
+        'INSPIRED_MOVE_COST_RATIO': INSPIRED_MOVE_COST_RATIO,
+    }
+    if globals().get('WIDTH') is not None:
+        result['map_width'] = WIDTH
+        result['map_height'] = HEIGHT
+    if globals().get('GAME_SEED') is not None:
+        result['game_seed'] = GAME_SEED
+    return result
+
+
 # TODO remove once width/height are sent by server (#78)
 def set_dimensions(width, height):
     global WIDTH, HEIGHT
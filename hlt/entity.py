@@ -15,13 +15,16 @@ class Entity(abc.ABC):
         self.position = position
 
     @staticmethod
-    def _generate(player_id):
+    def _generate(player_id, values=None):
         """
         Method which creates an entity for a specific player given input from the engine.
         :param player_id: The player id for the player who owns this entity
+        :param values: The entity's id, x and y if already read from the engine. Read from input if omitted.
         :return: An instance of Entity along with its id
         """
-        ship_id, x_position, y_position = map(int, read_input().split())
+        if values is None:
+            values = map(int, read_input().split())
+        ship_id, x_position, y_position = values
         return ship_id, Entity(player_id, ship_id, Position(x_position, y_position))
 
     def __repr__(self):
@@ -56,7 +59,6 @@ class Ship(Entity):
     """
     Ship class to house ship entities
     """
-    __ships = {}
 
     def __init__(self, owner, id, position, halite_amount):
         super().__init__(owner, id, position)
@@ -88,28 +90,31 @@ class Ship(Entity):
         return "{} {} {}".format(commands.MOVE, self.id, commands.STAY_STILL)
 
     @staticmethod
-    def _generate(player_id):
+    def _generate(player_id, values=None, known_ships=None):
         """
         Creates an instance of a ship for a given player given the engine's input.
-        If an instance with the same ship.id has previously been generated, that instance will be returned.
+        If known_ships already holds a ship with the same id, that instance is updated and returned instead.
         :param player_id: The id of the player who owns this ship
+        :param values: The ship's id, x, y and halite if already read from the engine. Read from input if omitted.
+        :param known_ships: {ship id: ship} of the player's ships last turn (see Player._update). Kept per player,
+                            and so per Game, so bots and matches sharing a process never share ship instances.
         :return: The ship id and ship object
         """
         # Read game engine input
-        ship_id, x_position, y_position, halite = map(int, read_input().split())
+        if values is None:
+            values = map(int, read_input().split())
+        ship_id, x_position, y_position, halite = values
 
         # Check storage to see if ship already exists
         # If the ship exists, update its position and halite
-        if ship_id in Ship.__ships.keys():    
-            old_ship = Ship.__ships[ship_id]
+        if known_ships is not None and ship_id in known_ships:
+            old_ship = known_ships[ship_id]
             old_ship.position = Position(x_position, y_position)
             old_ship.halite_amount = halite
             return ship_id, old_ship
         else:
             # Otherwise, create and return a new instance
-            new_ship = Ship(player_id, ship_id, Position(x_position, y_position), halite)
-            Ship.__ships[ship_id] = new_ship
-            return ship_id, new_ship
+            return ship_id, Ship(player_id, ship_id, Position(x_position, y_position), halite)
 
     def __repr__(self):
         return "{}(id={}, {}, cargo={} halite)".format(self.__class__.__name__,
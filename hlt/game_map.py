@@ -1,19 +1,58 @@
 import queue
 
+import numpy as np
+
 from . import constants
 from .entity import Entity, Shipyard, Ship, Dropoff
 from .player import Player
-from .positionals import Direction, Position
+from .positionals import Direction, Position, PositionArray, PositionTable
 from .common import read_input
+from .pathfinding import PathFinder
 
 
 class MapCell:
-    """A cell on the game map."""
-    def __init__(self, position, halite_amount):
+    """
+    A cell on the game map.
+
+    A lightweight view onto the GameMap's arrays: reading or assigning halite_amount, ship or structure
+    reads or writes the map's storage directly.
+    """
+    def __init__(self, game_map, position):
+        self._game_map = game_map
         self.position = position
-        self.halite_amount = halite_amount
-        self.ship = None
-        self.structure = None
+
+    @property
+    def halite_amount(self):
+        """
+        :return: How much halite is in this cell
+        """
+        return self._game_map.halite.item(self.position.y, self.position.x)
+
+    @halite_amount.setter
+    def halite_amount(self, halite_amount):
+        self._game_map.halite[self.position.y, self.position.x] = halite_amount
+
+    @property
+    def ship(self):
+        """
+        :return: The ship in this cell, or None
+        """
+        return self._game_map._ships.get(self._game_map.cell_index(self.position))
+
+    @ship.setter
+    def ship(self, ship):
+        self._game_map._set_ship(self._game_map.cell_index(self.position), ship)
+
+    @property
+    def structure(self):
+        """
+        :return: The shipyard or dropoff in this cell, or None
+        """
+        return self._game_map._structures.get(self._game_map.cell_index(self.position))
+
+    @structure.setter
+    def structure(self, structure):
+        self._game_map._set_structure(self._game_map.cell_index(self.position), structure)
 
     @property
     def is_empty(self):
@@ -61,17 +100,64 @@ class MapCell:
         return 'MapCell({}, halite={})'.format(self.position, self.halite_amount)
 
 
+class MapChanges:
+    """
+    What changed on the map between the previous frame and this one.
+
+    halite_cells: flat indices of the cells whose halite the engine reported as changed
+    moved_ships: (ship, previous flat index) for every ship that changed cells
+    spawned_ships: ships that appeared this frame
+    destroyed_ships: ships that disappeared this frame (collided, or turned into dropoffs), at their last known position
+    new_structures: dropoffs that appeared this frame (and every shipyard on the first frame)
+    """
+    def __init__(self, turn_number, halite_cells):
+        self.turn_number = turn_number
+        self.halite_cells = halite_cells
+        self.moved_ships = []
+        self.spawned_ships = []
+        self.destroyed_ships = []
+        self.new_structures = []
+
+    def __repr__(self):
+        return "{}(turn={}, {} cells, {} moved, {} spawned, {} destroyed, {} new structures)".format(
+            self.__class__.__name__, self.turn_number, len(self.halite_cells), len(self.moved_ships),
+            len(self.spawned_ships), len(self.destroyed_ships), len(self.new_structures))
+
+
 class GameMap:
     """
     The game map.
 
     Can be indexed by a position, or by a contained entity.
     Coordinates start at 0. Coordinates are normalized for you
+
+    Cell data is held in (height, width) numpy arrays so whole-map questions can be answered in one
+    vectorized expression:
+      halite: halite in each cell
+      ship_owner, ship_id: owner and id of the ship in each cell, -1 if there is none
+      structure_owner: owner of the shipyard or dropoff in each cell, -1 if there is none
+    Indexing the map returns a MapCell view onto these arrays.
+
+    positions is the map's PositionTable; creating a map makes it the table Positions are interned into.
+
+    Distances come from per-axis lookup tables built with the map: x_distances[dx % width] is the wrapped
+    distance between two columns dx apart (likewise y_distances for rows). distance_matrix() lazily builds
+    and caches the full cell-to-cell table.
     """
-    def __init__(self, cells, width, height):
+    def __init__(self, halite, width, height):
         self.width = width
         self.height = height
-        self._cells = cells
+        self.positions = PositionTable(width, height).activate()
+        self._build_distance_tables()
+        self._path_finder = None
+        self.halite = np.asarray(halite, dtype=np.int32).reshape(height, width)
+        self.ship_owner = np.full((height, width), -1, dtype=np.int32)
+        self.ship_id = np.full((height, width), -1, dtype=np.int32)
+        self.structure_owner = np.full((height, width), -1, dtype=np.int32)
+        self._ships = {}
+        self._structures = {}
+        # Ship id -> (ship, flat index) as of the last update, to work out what moved
+        self._tracked_ships = {}
 
     def __getitem__(self, location):
         """
@@ -80,12 +166,72 @@ class GameMap:
         :return: the contents housing that cell or entity
         """
         if isinstance(location, Position):
-            location = self.normalize(location)
-            return self._cells[location.y][location.x]
+            return MapCell(self, self.normalize(location))
         elif isinstance(location, Entity):
-            return self._cells[location.position.y][location.position.x]
+            return MapCell(self, location.position)
         return None
 
+    def cell_index(self, position):
+        """
+        :param position: A normalized position
+        :return: The position's index into the flattened (row-major) map arrays
+        """
+        return position.y * self.width + position.x
+
+    def _set_ship(self, index, ship):
+        """
+        Places a ship in (or, given None, clears) the cell at a flat index.
+        """
+        y, x = divmod(index, self.width)
+        if ship is None:
+            self._ships.pop(index, None)
+            self.ship_owner[y, x] = -1
+            self.ship_id[y, x] = -1
+        else:
+            self._ships[index] = ship
+            self.ship_owner[y, x] = ship.owner
+            self.ship_id[y, x] = ship.id
+
+    def _set_structure(self, index, structure):
+        """
+        Places a structure in (or, given None, clears) the cell at a flat index.
+        """
+        y, x = divmod(index, self.width)
+        if structure is None:
+            self._structures.pop(index, None)
+            self.structure_owner[y, x] = -1
+        else:
+            self._structures[index] = structure
+            self.structure_owner[y, x] = structure.owner
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        # Lookup tables are rebuilt on unpickling rather than stored
+        for name in ('positions', 'x_distances', 'y_distances', '_x_distance_list', '_y_distance_list',
+                     '_distance_matrix', '_path_finder'):
+            del state[name]
+        return state
+
+    def __setstate__(self, state):
+        """
+        Restores a pickled map, converting maps pickled before cell data moved into arrays.
+        """
+        cells = state.pop('_cells', None)
+        self.__dict__.update(state)
+        if cells is None:
+            self.positions = PositionTable(self.width, self.height).activate()
+            self._build_distance_tables()
+            self._path_finder = None
+        else:
+            legacy = [[vars(cell) for cell in row] for row in cells]
+            self.__init__([[cell['halite_amount'] for cell in row] for row in legacy], self.width, self.height)
+            for y, row in enumerate(legacy):
+                for x, cell in enumerate(row):
+                    if cell['ship'] is not None:
+                        self._set_ship(y * self.width + x, cell['ship'])
+                    if cell['structure'] is not None:
+                        self._set_structure(y * self.width + x, cell['structure'])
+
     def calculate_distance(self, source, target):
         """
         Compute the Manhattan distance between two locations.
@@ -94,11 +240,60 @@ class GameMap:
         :param target: The target to where calculate
         :return: The distance between these items
         """
-        source = self.normalize(source)
-        target = self.normalize(target)
-        resulting_position = abs(source - target)
-        return min(resulting_position.x, self.width - resulting_position.x) + \
-            min(resulting_position.y, self.height - resulting_position.y)
+        return self._x_distance_list[(source.x - target.x) % self.width] + \
+            self._y_distance_list[(source.y - target.y) % self.height]
+
+    def _build_distance_tables(self):
+        """
+        Builds the per-axis wrapped distance tables. The full distance matrix is left to distance_matrix().
+        """
+        self._x_distance_list = [min(dx, self.width - dx) for dx in range(self.width)]
+        self._y_distance_list = [min(dy, self.height - dy) for dy in range(self.height)]
+        self.x_distances = np.array(self._x_distance_list, dtype=np.int16)
+        self.y_distances = np.array(self._y_distance_list, dtype=np.int16)
+        self._distance_matrix = None
+
+    def axis_distances(self, source, target):
+        """
+        The wrapped x and y distances between locations.
+        :param source: A Position, or a PositionArray
+        :param target: A Position, or a PositionArray (the same length as source if both are arrays)
+        :return: (dx, dy): ints for two Positions, otherwise element-wise arrays
+        """
+        if isinstance(source, Position) and isinstance(target, Position):
+            return (self._x_distance_list[(source.x - target.x) % self.width],
+                    self._y_distance_list[(source.y - target.y) % self.height])
+        source_xs, source_ys = (source.xs, source.ys) if isinstance(source, PositionArray) else (source.x, source.y)
+        target_xs, target_ys = (target.xs, target.ys) if isinstance(target, PositionArray) else (target.x, target.y)
+        return (self.x_distances[(source_xs - target_xs) % self.width],
+                self.y_distances[(source_ys - target_ys) % self.height])
+
+    def calculate_distances(self, sources, targets):
+        """
+        Batched calculate_distance.
+        :param sources: A Position, or a PositionArray
+        :param targets: A Position, or a PositionArray (the same length as sources if both are arrays)
+        :return: Array of wrapped Manhattan distances
+        """
+        dx, dy = self.axis_distances(sources, targets)
+        return dx + dy
+
+    def distance_matrix(self):
+        """
+        The wrapped Manhattan distance between every pair of cells, built on first use and cached.
+        Row and column are flat (row-major) cell indices. At 64x64 this is a 4096x4096 int16 array, about 32 MB.
+        :return: The (width * height, width * height) distance matrix
+        """
+        if self._distance_matrix is None:
+            columns = np.arange(self.width)
+            rows = np.arange(self.height)
+            x_table = self.x_distances[(columns[:, np.newaxis] - columns[np.newaxis, :]) % self.width]
+            y_table = self.y_distances[(rows[:, np.newaxis] - rows[np.newaxis, :]) % self.height]
+            # Indexed [y1, x1, y2, x2], which flattens to [y1 * width + x1, y2 * width + x2]
+            matrix = y_table[:, np.newaxis, :, np.newaxis] + x_table[np.newaxis, :, np.newaxis, :]
+            cells = self.width * self.height
+            self._distance_matrix = matrix.reshape(cells, cells)
+        return self._distance_matrix
 
     def normalize(self, position):
         """
@@ -109,7 +304,7 @@ class GameMap:
         :param position: A position object.
         :return: A normalized position object fitting within the bounds of the map
         """
-        return Position(position.x % self.width, position.y % self.height)
+        return self.positions.positions[(position.y % self.height) * self.width + position.x % self.width]
 
     @staticmethod
     def _get_target_direction(source, target):
@@ -164,33 +359,105 @@ class GameMap:
 
         return Direction.Still
 
+    @property
+    def path_finder(self):
+        """
+        :return: The map's PathFinder for halite-cost-aware navigation, created on first use
+        """
+        if self._path_finder is None:
+            self._path_finder = PathFinder(self)
+        return self._path_finder
+
+    def navigate(self, ship, destination):
+        """
+        Returns a singular safe move along the cheapest path (in halite burned) towards the destination.
+        Falls back to other moves that still make progress if the best next cell is occupied.
+
+        :param ship: The ship to move.
+        :param destination: Ending position
+        :return: A direction.
+        """
+        moves = self.path_finder.tree(self.normalize(destination)).rank_moves(ship.position)
+        still_cost = next(cost for cost, direction, _ in moves if direction == Direction.Still)
+        for cost, direction, target_pos in moves:
+            if cost >= still_cost:
+                break
+            if not self[target_pos].is_occupied:
+                self[target_pos].mark_unsafe(ship)
+                return direction
+
+        return Direction.Still
+
     @staticmethod
-    def _generate():
+    def _generate(map_width=None, map_height=None, halite_values=None):
         """
         Creates a map object from the input given by the game engine
+        :param map_width: The map width, if already read from the engine
+        :param map_height: The map height, if already read from the engine
+        :param halite_values: Flat, row-major list of every cell's halite, if already read from the engine.
+                              The whole map is read line by line from input if omitted.
         :return: The map object
         """
-        map_width, map_height = map(int, read_input().split())
-        game_map = [[None for _ in range(map_width)] for _ in range(map_height)]
-        for y_position in range(map_height):
-            cells = read_input().split()
-            for x_position in range(map_width):
-                game_map[y_position][x_position] = MapCell(Position(x_position, y_position,
-                                                                    normalize=False),
-                                                           int(cells[x_position]))
-        return GameMap(game_map, map_width, map_height)
-
-    def _update(self):
-        """
-        Updates this map object from the input given by the game engine
-        :return: nothing
-        """
-        # Mark cells as safe for navigation (will re-mark unsafe cells
-        # later)
-        for y in range(self.height):
-            for x in range(self.width):
-                self[Position(x, y)].ship = None
-
-        for _ in range(int(read_input())):
-            cell_x, cell_y, cell_energy = map(int, read_input().split())
-            self[Position(cell_x, cell_y)].halite_amount = cell_energy
+        if halite_values is None:
+            map_width, map_height = map(int, read_input().split())
+            halite_values = []
+            for _ in range(map_height):
+                halite_values.extend(map(int, read_input().split()))
+
+        return GameMap(halite_values, map_width, map_height)
+
+    def _update(self, cell_values=None, players=(), turn_number=0):
+        """
+        Updates this map object from the input given by the game engine.
+        Only cells whose halite changed, cells that held a ship (or were marked unsafe) and cells that hold a ship now
+        are touched.
+        :param cell_values: Flat list of (x, y, halite) for every changed cell, if already read from the engine.
+                            Read line by line from input if omitted.
+        :param players: The already-updated players whose ships and structures should be placed on the map
+        :param turn_number: The turn being updated to, recorded in the change set
+        :return: A MapChanges describing what changed since the previous update
+        """
+        if cell_values is None:
+            cell_values = []
+            for _ in range(int(read_input())):
+                cell_values.extend(map(int, read_input().split()))
+
+        if cell_values:
+            cells = np.asarray(cell_values, dtype=np.int32).reshape(-1, 3)
+            self.halite[cells[:, 1], cells[:, 0]] = cells[:, 2]
+            changes = MapChanges(turn_number, (cells[:, 1] * self.width + cells[:, 0]).tolist())
+        else:
+            changes = MapChanges(turn_number, [])
+
+        if self._path_finder is not None:
+            self._path_finder.clear()
+
+        tracked_ships = {}
+        for player in players:
+            for ship in player.get_ships():
+                tracked_ships[ship.id] = (ship, self.cell_index(ship.position))
+
+            for structure in [player.shipyard] + player.get_dropoffs():
+                index = self.cell_index(structure.position)
+                if index not in self._structures:
+                    self._set_structure(index, structure)
+                    changes.new_structures.append(structure)
+
+        # Mark cells as safe for navigation unless a ship is still there
+        occupied = {index for _, index in tracked_ships.values()}
+        for index in [index for index in self._ships if index not in occupied]:
+            self._set_ship(index, None)
+
+        for ship_id, (ship, index) in tracked_ships.items():
+            previous = self._tracked_ships.get(ship_id)
+            if previous is None:
+                changes.spawned_ships.append(ship)
+            elif previous[1] != index:
+                changes.moved_ships.append((ship, previous[1]))
+            if self._ships.get(index) is not ship:
+                self._set_ship(index, ship)
+
+        changes.destroyed_ships = [ship for ship_id, (ship, _) in self._tracked_ships.items()
+                                   if ship_id not in tracked_ships]
+        self._tracked_ships = tracked_ships
+        return changes
@@ -0,0 +1,86 @@
+import atexit
+import logging
+import logging.handlers
+import queue
+
+_listener = None
+_handler = None
+
+
+class _DroppingQueueHandler(logging.handlers.QueueHandler):
+    """
+    Puts records on a bounded queue without formatting them or ever blocking the caller.
+
+    Records are formatted by the writer thread, so a message's arguments should not be mutated after they are
+    logged. When the queue is full, records are dropped and counted instead of stalling the turn.
+    """
+    def __init__(self, record_queue):
+        super().__init__(record_queue)
+        self.dropped = 0
+
+    def prepare(self, record):
+        # Tracebacks cannot outlive the frame that raised them, so exceptions are still rendered here
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+def start(filename, level=logging.DEBUG, capacity=10000):
+    """
+    Sends the root logger's records to filename through a background writer thread.
+    :param filename: The log file, overwritten
+    :param level: The root logger's level
+    :param capacity: How many records may wait to be written before new ones are dropped
+    :return: nothing.
+    """
+    global _listener, _handler
+    stop()
+    record_queue = queue.Queue(capacity)
+    file_handler = logging.FileHandler(filename, mode="w")
+    file_handler.setFormatter(logging.Formatter(logging.BASIC_FORMAT))
+    _handler = _DroppingQueueHandler(record_queue)
+    root = logging.getLogger()
+    root.addHandler(_handler)
+    root.setLevel(level)
+    _listener = logging.handlers.QueueListener(record_queue, file_handler)
+    _listener.start()
+
+
+def stop():
+    """
+    Writes out every queued record and stops the writer thread. Safe to call more than once.
+    :return: nothing.
+    """
+    global _listener, _handler
+    if _listener is None:
+        return
+    logging.getLogger().removeHandler(_handler)
+    _listener.stop()
+    file_handler = _listener.handlers[0]
+    if _handler.dropped:
+        file_handler.handle(logging.makeLogRecord({
+            "levelno": logging.WARNING, "levelname": "WARNING", "name": "root",
+            "msg": "%s log records were dropped because the log queue was full", "args": (_handler.dropped,)}))
+    file_handler.close()
+    _listener = None
+    _handler = None
+
+
+def shutdown():
+    """
+    Flushes the log pipeline, then shuts down logging. Used when the engine closes the connection.
+    :return: nothing.
+    """
+    stop()
+    logging.shutdown()
+
+
+# Registered after logging's own exit hook, so it runs first and the backlog is written before handlers close
+atexit.register(stop)
@@ -2,41 +2,77 @@ import json
 import logging
 import sys
 
-from .common import read_input
-from . import constants
+from .command_queue import CommandQueue
+from .common import FrameReader, LineReader
+from . import constants, log_pipeline
 from .game_map import GameMap, Player
+from .occupancy import Occupancy
+from .scheduler import TurnScheduler
 
 
 class Game:
     """
     The game object holds all metadata pertinent to the game and all its contents
     """
-    def __init__(self):
+    def __init__(self, bulk_input=True, reader=None):
         """
         Initiates a game object collecting all start-state instances for the contained items for pre-game.
-        Also sets up basic logging.
+        Also starts logging to bot-<id>.log through a background writer (see log_pipeline).
+        :param bulk_input: Read each frame from stdin's byte buffer in bulk. If False, or if stdin has no byte
+                           buffer, fall back to reading one line at a time through read_input().
+        :param reader: Read the game from this instead of stdin (anything with read_line and read_ints, e.g. a
+                       FrameReader over a byte stream). Such games are offline: they neither log to a file nor
+                       arm the turn watchdog.
         """
         self.turn_number = 0
+        self.changes = None
+        self.occupancy = None
+        self.scheduler = TurnScheduler(send_commands, watchdog=reader is None)
+        self._subscribers = []
+        if reader is not None:
+            self._reader = reader
+        else:
+            self._reader = FrameReader.for_stdin() if bulk_input else LineReader()
 
         # Grab constants JSON
-        raw_constants = read_input()
+        raw_constants = self._reader.read_line()
         constants.load_constants(json.loads(raw_constants))
 
-        num_players, self.my_id = map(int, read_input().split())
+        num_players, self.my_id = self._reader.read_ints(2)
 
-        logging.basicConfig(
-            filename="bot-{}.log".format(self.my_id),
-            filemode="w",
-            level=logging.DEBUG,
-        )
+        if reader is None:
+            log_pipeline.start("bot-{}.log".format(self.my_id))
 
         self.players = {}
         for player in range(num_players):
-            self.players[player] = Player._generate()
+            self.players[player] = Player._generate(self._reader.read_ints(3))
         self.me = self.players[self.my_id]
-        self.game_map = GameMap._generate()
+        map_width, map_height = self._reader.read_ints(2)
+        self.game_map = GameMap._generate(map_width, map_height, self._reader.read_ints(map_width * map_height))
 
         constants.set_dimensions(self.game_map.width, self.game_map.height)
+        for player in self.players.values():
+            player._track_deposits(self.game_map.positions)
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        # Neither the stdin reader, the turn clock nor subscribed callbacks belong in a saved game state
+        state['_reader'] = None
+        state['_subscribers'] = []
+        state['scheduler'] = None
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        # Games pickled before change tracking and deposit fields existed
+        self.__dict__.setdefault('changes', None)
+        self.__dict__.setdefault('occupancy', None)
+        if self.__dict__.get('scheduler') is None:
+            self.scheduler = TurnScheduler(send_commands)
+        self.__dict__.setdefault('_subscribers', [])
+        for player in self.players.values():
+            if player.deposit_field is None:
+                player._track_deposits(self.game_map.positions)
 
     def ready(self, name):
         """
@@ -47,35 +83,53 @@ class Game:
 
     def update_frame(self):
         """
-        Updates the game object's state.
+        Updates the game object's state. The turn's clock (see self.scheduler) starts once the turn number is read.
         :returns: nothing.
         """
-        self.turn_number = int(read_input())
-        logging.info("=============== TURN {:03} ================".format(self.turn_number))
+        reader = self._reader
+        self.turn_number, = reader.read_ints(1)
+        self.scheduler.start(self.turn_number)
+        logging.info("=============== TURN %03d ================", self.turn_number)
 
         for _ in range(len(self.players)):
-            player, num_ships, num_dropoffs, halite = map(int, read_input().split())
-            self.players[player]._update(num_ships, num_dropoffs, halite)
+            player, num_ships, num_dropoffs, halite = reader.read_ints(4)
+            self.players[player]._update(num_ships, num_dropoffs, halite,
+                                         reader.read_ints(4 * num_ships), reader.read_ints(3 * num_dropoffs))
 
-        self.game_map._update()
+        num_cells, = reader.read_ints(1)
+        self.changes = self.game_map._update(reader.read_ints(3 * num_cells), self.players.values(), self.turn_number)
+        self.occupancy = Occupancy(self.game_map, self.my_id)
 
-        # Mark cells with ships as unsafe for navigation
-        for player in self.players.values():
-            for ship in player.get_ships():
-                self.game_map[ship.position].mark_unsafe(ship)
+        for callback in self._subscribers:
+            callback(self.changes)
+
+    def subscribe(self, callback):
+        """
+        Registers a callback to be called with each frame's MapChanges once update_frame has applied them.
+        :param callback: A function taking a MapChanges
+        :return: nothing.
+        """
+        self._subscribers.append(callback)
 
-            self.game_map[player.shipyard.position].structure = player.shipyard
-            for dropoff in player.get_dropoffs():
-                self.game_map[dropoff.position].structure = dropoff
+    def command_queue(self):
+        """
+        :return: An empty CommandQueue for this turn, keeping the turn's Occupancy current as commands are queued
+        """
+        if self.occupancy is None:
+            # Saved game states restored without a fresh frame
+            self.occupancy = Occupancy(self.game_map, self.my_id)
+        return CommandQueue(self.occupancy)
 
-    @staticmethod
-    def end_turn(commands):
+    def end_turn(self, commands):
         """
         Method to send all commands to the game engine, effectively ending your turn.
-        :param commands: Array of commands to send to engine
-        :return: nothing.
+        Does nothing if the scheduler's watchdog already submitted a fallback for this turn.
+        :param commands: A CommandQueue, or an array of command strings, to send to engine
+        :return: True if the commands were sent.
         """
-        send_commands(commands)
+        if isinstance(commands, CommandQueue):
+            commands = commands.to_commands()
+        return self.scheduler.submit(commands)
 
 
 def send_commands(commands):
@@ -0,0 +1,50 @@
+class Occupancy:
+    """
+    Who is on, and who is moving to, each cell this turn, keyed by flat cell index.
+
+    Built once per frame by Game.update_frame from the map's ships, and kept current by the CommandQueue it is
+    given to, so "is anyone at / moving to this cell" is a dict lookup rather than a scan of the fleet.
+    """
+    def __init__(self, game_map, my_id):
+        """
+        :param game_map: The frame's GameMap
+        :param my_id: The id of the player whose ships count as own ships
+        """
+        self.game_map = game_map
+        self.own_ships = {}
+        self.enemy_ships = {}
+        for index, ship in game_map._ships.items():
+            if ship.owner == my_id:
+                self.own_ships[index] = ship
+            else:
+                self.enemy_ships[index] = ship
+        # cell index: the command record that will occupy the cell next turn
+        self.committed = {}
+
+    def _index(self, position):
+        return self.game_map.cell_index(self.game_map.normalize(position))
+
+    def own_ship_at(self, position):
+        """
+        :return: The own ship on position, or None
+        """
+        return self.own_ships.get(self._index(position))
+
+    def enemy_ship_at(self, position):
+        """
+        :return: The enemy ship on position, or None
+        """
+        return self.enemy_ships.get(self._index(position))
+
+    def committed_to(self, position):
+        """
+        :return: The queued command record that ends on position, or None
+        """
+        return self.committed.get(self._index(position))
+
+    def commit(self, position, record):
+        """
+        Records that a queued command will occupy position next turn.
+        :return: nothing.
+        """
+        self.committed[self._index(position)] = record
@@ -0,0 +1,331 @@
+import heapq
+
+import numpy as np
+
+from . import constants
+from .positionals import Direction
+
+# neighbour_indices are ordered North, South, East, West. A cell reached as a destination's North neighbour
+# has to step South to get there, and so on.
+_STEP_TOWARDS = [Direction.South, Direction.North, Direction.West, Direction.East]
+
+
+class PathTree:
+    """
+    The cheapest path from every cell to one destination, searched lazily.
+
+    A reverse Dijkstra search over the toroidal map, where leaving a cell costs the halite a ship burns moving
+    off it (plus the finder's step_cost). The search only expands as far as the queries asked of it need, and
+    picks up where it left off for the next query, so a tree shared by many ships is never searched twice.
+    """
+    def __init__(self, finder, destination):
+        self._finder = finder
+        self.destination = destination
+        cells = len(finder.burn)
+        self._costs = [None] * cells
+        self._directions = [None] * cells
+        self._settled = bytearray(cells)
+        self._costs[destination] = 0
+        self._directions[destination] = Direction.Still
+        self._heap = [(0, destination)]
+
+    def _settle(self, index):
+        """
+        Continues the search until the cell at index has its final cost.
+        """
+        settled = self._settled
+        costs = self._costs
+        directions = self._directions
+        heap = self._heap
+        weights = self._finder._weights
+        neighbour_indices = self._finder.game_map.positions.neighbour_indices
+        while not settled[index] and heap:
+            cost, current = heapq.heappop(heap)
+            if settled[current]:
+                continue
+            settled[current] = 1
+            for step, neighbour in zip(_STEP_TOWARDS, neighbour_indices[current]):
+                if not settled[neighbour]:
+                    neighbour_cost = cost + weights[neighbour]
+                    known = costs[neighbour]
+                    if known is None or neighbour_cost < known:
+                        costs[neighbour] = neighbour_cost
+                        directions[neighbour] = step
+                        heapq.heappush(heap, (neighbour_cost, neighbour))
+
+    def _encoded_cost(self, index):
+        self._settle(index)
+        return self._costs[index]
+
+    def cost(self, position):
+        """
+        :param position: A normalized position
+        :return: The path cost (halite burned plus step_cost per step) of the cheapest path from position
+        """
+        return self._encoded_cost(self._finder.game_map.cell_index(position)) // self._finder._scale
+
+    def steps(self, position):
+        """
+        :param position: A normalized position
+        :return: How many moves the cheapest path from position takes
+        """
+        return self._encoded_cost(self._finder.game_map.cell_index(position)) % self._finder._scale
+
+    def halite_cost(self, position):
+        """
+        :param position: A normalized position
+        :return: The halite a ship burns following the cheapest path from position
+        """
+        return self.cost(position) - self._finder.step_cost * self.steps(position)
+
+    def direction(self, position):
+        """
+        :param position: A normalized position
+        :return: The first move of the cheapest path from position (Direction.Still at the destination)
+        """
+        index = self._finder.game_map.cell_index(position)
+        self._settle(index)
+        return self._directions[index]
+
+    def path(self, position):
+        """
+        :param position: A normalized position
+        :return: The positions along the cheapest path from (but not including) position to the destination
+        """
+        result = []
+        while True:
+            direction = self.direction(position)
+            if direction == Direction.Still:
+                return result
+            position = position.directional_offset(direction)
+            result.append(position)
+
+    def rank_moves(self, position):
+        """
+        Every move from position, ranked by the cost of the cheapest path left to take after making it.
+        :param position: A normalized position
+        :return: A list of (encoded cost, direction, position) for Still and the four cardinals, cheapest first.
+                 Encoded costs only compare against each other; moves cheaper than Still make progress.
+        """
+        game_map = self._finder.game_map
+        index = game_map.cell_index(position)
+        moves = [(self._encoded_cost(index), Direction.Still, position)]
+        for direction, neighbour in zip(Direction.get_all_cardinals(), game_map.positions.neighbour_indices[index]):
+            moves.append((self._encoded_cost(neighbour), direction, game_map.positions.positions[neighbour]))
+        return sorted(moves, key=lambda move: move[0])
+
+
+class PathFinder:
+    """
+    Halite-cost-aware shortest paths over a GameMap.
+
+    Moving off a cell burns 1/MOVE_COST_RATIO of its halite (rounded down). Paths minimize that burn plus
+    step_cost per move, breaking ties by the number of moves. Path trees are cached per destination until clear()
+    is called, which GameMap does whenever it is updated, so ships sharing a destination share one search.
+    """
+    def __init__(self, game_map, step_cost=0):
+        self.game_map = game_map
+        self.step_cost = step_cost
+        # Encoded edge weight = (burn + step_cost) * scale + 1. No path takes scale moves, so comparing encoded
+        # costs compares path cost first and number of moves second.
+        self._scale = game_map.width * game_map.height
+        self._trees = {}
+        self.burn = None
+        self._weights = None
+        self.clear()
+
+    def clear(self):
+        """
+        Drops every cached tree and re-reads the map's halite. Call whenever the map's halite changes.
+        """
+        self._trees = {}
+        self.burn = (self.game_map.halite // constants.MOVE_COST_RATIO).ravel().tolist()
+        self._weights = [(burn + self.step_cost) * self._scale + 1 for burn in self.burn]
+
+    def tree(self, destination):
+        """
+        :param destination: A normalized position
+        :return: The (cached) PathTree of cheapest paths into destination
+        """
+        index = self.game_map.cell_index(destination)
+        tree = self._trees.get(index)
+        if tree is None:
+            tree = self._trees[index] = PathTree(self, index)
+        return tree
+
+    def next_direction(self, source, destination):
+        """
+        :return: The first move of the cheapest path from source to destination
+        """
+        return self.tree(destination).direction(source)
+
+    def path_cost(self, source, destination):
+        """
+        :return: The path cost (halite burned plus step_cost per step) of the cheapest path from source to destination
+        """
+        return self.tree(destination).cost(source)
+
+
+class DistanceField:
+    """
+    Number of moves from every cell to the nearest of a set of source cells (e.g. a player's shipyard and dropoffs).
+
+    Built by a multi-source breadth-first search over the toroidal map. Adding a source only relaxes the cells it
+    brings closer, and removing one only re-searches the cells that were nearest to it, so the field never has to be
+    rebuilt as sources come and go.
+    """
+    def __init__(self, position_table, sources=()):
+        self._table = position_table
+        cells = position_table.width * position_table.height
+        # Cells with no source at all keep this distance, more than any real one
+        self._unreachable = cells
+        self.distances = [cells] * cells
+        self.nearest = [None] * cells
+        self.source_indices = set()
+        self.add_sources(sources)
+
+    @property
+    def sources(self):
+        """
+        :return: The positions of every source, in no particular order
+        """
+        return [self._table.positions[index] for index in self.source_indices]
+
+    def add_sources(self, positions):
+        """
+        Adds source cells, updating only the part of the field they are nearest to.
+        :param positions: Positions of the new sources
+        :return: nothing.
+        """
+        table = self._table
+        distances = self.distances
+        nearest = self.nearest
+        neighbour_indices = table.neighbour_indices
+        frontier = []
+        for position in positions:
+            index = table.index(position)
+            self.source_indices.add(index)
+            if distances[index] > 0:
+                distances[index] = 0
+                nearest[index] = index
+                frontier.append(index)
+
+        while frontier:
+            next_frontier = []
+            for current in frontier:
+                distance = distances[current] + 1
+                for neighbour in neighbour_indices[current]:
+                    if distance < distances[neighbour]:
+                        distances[neighbour] = distance
+                        nearest[neighbour] = nearest[current]
+                        next_frontier.append(neighbour)
+            frontier = next_frontier
+
+    def remove_source(self, position):
+        """
+        Removes a source cell, re-searching only the cells that were nearest to it.
+        :param position: Position of the source to remove
+        :return: nothing.
+        """
+        table = self._table
+        index = table.index(position)
+        if index not in self.source_indices:
+            return
+        self.source_indices.discard(index)
+
+        distances = self.distances
+        nearest = self.nearest
+        neighbour_indices = table.neighbour_indices
+        # Every cell that was nearest to the removed source is connected to it through cells that were too
+        region = [index]
+        nearest[index] = None
+        for current in region:
+            for neighbour in neighbour_indices[current]:
+                if nearest[neighbour] == index:
+                    nearest[neighbour] = None
+                    region.append(neighbour)
+        for current in region:
+            distances[current] = self._unreachable
+
+        # Re-seed the region from its border, then search inwards
+        heap = []
+        for current in region:
+            for neighbour in neighbour_indices[current]:
+                if nearest[neighbour] is not None and distances[neighbour] + 1 < distances[current]:
+                    distances[current] = distances[neighbour] + 1
+                    nearest[current] = nearest[neighbour]
+            if nearest[current] is not None:
+                heap.append((distances[current], current))
+        heapq.heapify(heap)
+        while heap:
+            distance, current = heapq.heappop(heap)
+            if distance > distances[current]:
+                continue
+            for neighbour in neighbour_indices[current]:
+                if distance + 1 < distances[neighbour]:
+                    distances[neighbour] = distance + 1
+                    nearest[neighbour] = nearest[current]
+                    heapq.heappush(heap, (distance + 1, neighbour))
+
+    def distance(self, position):
+        """
+        :return: How many moves it takes to get from position to the nearest source
+        """
+        return self.distances[self._table.index(position)]
+
+    def nearest_source(self, position):
+        """
+        :return: The position of the source nearest to position, or None if there are no sources
+        """
+        index = self.nearest[self._table.index(position)]
+        return None if index is None else self._table.positions[index]
+
+    def next_step(self, position):
+        """
+        Follows the field downhill.
+        :return: A direction that brings position one move closer to the nearest source (Direction.Still on a source)
+        """
+        index = self._table.index(position)
+        distance = self.distances[index]
+        for direction, neighbour in zip(Direction.get_all_cardinals(), self._table.neighbour_indices[index]):
+            if self.distances[neighbour] < distance:
+                return direction
+        return Direction.Still
+
+
+class TargetIndex(DistanceField):
+    """
+    The nearest cell holding at least threshold halite, for every cell on the map, built once per turn.
+
+    Ships claim the targets they pick, which removes those cells from the index so the next ship is pointed
+    at the next-nearest rich cell. Once every rich cell is claimed, targets are shared again.
+    """
+    def __init__(self, game_map, threshold):
+        self.threshold = threshold
+        positions = game_map.positions.positions
+        self._rich = [positions[index] for index in np.flatnonzero(game_map.halite.ravel() >= threshold).tolist()]
+        # Distances to every rich cell, claimed or not; built only once every rich cell is claimed
+        self._all_rich = None
+        super().__init__(game_map.positions, self._rich)
+
+    def nearest_target(self, position):
+        """
+        :param position: Where to search from
+        :return: The nearest unclaimed cell with at least threshold halite. If all are claimed, the nearest
+                 such cell regardless of claims. None if there are no such cells at all.
+        """
+        if self.source_indices:
+            return self.nearest_source(position)
+        if not self._rich:
+            return None
+        if self._all_rich is None:
+            self._all_rich = DistanceField(self._table, self._rich)
+        return self._all_rich.nearest_source(position)
+
+    def claim(self, target):
+        """
+        Takes a target out of the index, so other ships look elsewhere.
+        :param target: The claimed position
+        :return: nothing.
+        """
+        self.remove_source(target)
@@ -1,4 +1,5 @@
 from .entity import Shipyard, Ship, Dropoff
+from .pathfinding import DistanceField
 from .positionals import Position
 from .common import read_input
 
@@ -12,6 +13,18 @@ class Player:
         self.halite_amount = halite
         self._ships = {}
         self._dropoffs = {}
+        self.deposit_field = None
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        # The deposit field is rebuilt from the map when the game is unpickled
+        state['deposit_field'] = None
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        # Players pickled before deposit fields existed
+        self.__dict__.setdefault('deposit_field', None)
 
     def get_ship(self, ship_id):
         """
@@ -54,23 +67,76 @@ class Player:
         return ship_id in self._ships
 
 
+    def distance_to_deposit(self, position):
+        """
+        :param position: The position to measure from
+        :return: How many moves it takes to reach this player's nearest shipyard or dropoff
+        """
+        return self.deposit_field.distance(position)
+
+    def nearest_deposit(self, position):
+        """
+        :param position: The position to measure from
+        :return: The position of this player's shipyard or dropoff nearest to position
+        """
+        return self.deposit_field.nearest_source(position)
+
+    def next_step_home(self, position):
+        """
+        :param position: The position to move from
+        :return: A direction that brings position one move closer to this player's nearest shipyard or dropoff
+        """
+        return self.deposit_field.next_step(position)
+
+    def _track_deposits(self, position_table):
+        """
+        Builds the field of distances to this player's shipyard and dropoffs, which _update then keeps current.
+        :param position_table: The PositionTable of the map being played on
+        :return: nothing.
+        """
+        self.deposit_field = DistanceField(position_table,
+                                           [self.shipyard.position] + [dropoff.position for dropoff in self.get_dropoffs()])
+
     @staticmethod
-    def _generate():
+    def _generate(values=None):
         """
         Creates a player object from the input given by the game engine
+        :param values: The player id and shipyard x and y if already read from the engine. Read from input if omitted.
         :return: The player object
         """
-        player, shipyard_x, shipyard_y = map(int, read_input().split())
+        if values is None:
+            values = map(int, read_input().split())
+        player, shipyard_x, shipyard_y = values
         return Player(player, Shipyard(player, -1, Position(shipyard_x, shipyard_y, normalize=False)))
 
-    def _update(self, num_ships, num_dropoffs, halite):
+    def _update(self, num_ships, num_dropoffs, halite, ship_values=None, dropoff_values=None):
         """
         Updates this player object considering the input from the game engine for the current specific turn.
         :param num_ships: The number of ships this player has this turn
         :param num_dropoffs: The number of dropoffs this player has this turn
         :param halite: How much halite the player has in total
+        :param ship_values: Flat list of (id, x, y, halite) for every ship, if already read from the engine.
+                            Read line by line from input if omitted.
+        :param dropoff_values: Flat list of (id, x, y) for every dropoff, if already read from the engine.
+                               Read line by line from input if omitted.
         :return: nothing.
         """
         self.halite_amount = halite
-        self._ships = {id: ship for (id, ship) in [Ship._generate(self.id) for _ in range(num_ships)]}
-        self._dropoffs = {id: dropoff for (id, dropoff) in [Dropoff._generate(self.id) for _ in range(num_dropoffs)]}
+        previous_dropoffs = self._dropoffs
+        # Ships keep their instances from turn to turn; ship ids are never reused within a game
+        previous_ships = self._ships
+        if ship_values is None:
+            self._ships = {id: ship for (id, ship) in [Ship._generate(self.id, known_ships=previous_ships)
+                                                       for _ in range(num_ships)]}
+        else:
+            self._ships = dict(Ship._generate(self.id, ship_values[i:i + 4], previous_ships)
+                               for i in range(0, 4 * num_ships, 4))
+        if dropoff_values is None:
+            self._dropoffs = {id: dropoff for (id, dropoff) in [Dropoff._generate(self.id) for _ in range(num_dropoffs)]}
+        else:
+            self._dropoffs = dict(Dropoff._generate(self.id, dropoff_values[i:i + 3])
+                                  for i in range(0, 3 * num_dropoffs, 3))
+
+        if self.deposit_field is not None:
+            self.deposit_field.add_sources(dropoff.position for dropoff_id, dropoff in self._dropoffs.items()
+                                           if dropoff_id not in previous_dropoffs)
@@ -1,3 +1,5 @@
+import numpy as np
+
 from . import commands
 from . import constants
 
@@ -63,12 +65,27 @@ class Direction:
 
 
 class Position:
-    def __init__(self, x, y, normalize=True):
-        self.x = x
-        self.y = y
+    """
+    A cell coordinate.
+
+    While a PositionTable is active, normalized positions are interned: Position(x, y) and position arithmetic
+    return the table's shared instance for that cell instead of allocating a new one. Shared instances must be
+    treated as immutable; += and -= rebind to a new position rather than changing the old one.
+    """
+    __slots__ = ('x', 'y')
 
-        if normalize:
-            self.normalize()
+    def __new__(cls, x=None, y=None, normalize=True):
+        table = _active_table
+        if normalize and table is not None and x is not None:
+            return table.positions[(y % table.height) * table.width + x % table.width]
+        self = object.__new__(cls)
+        # Only pickle calls this without coordinates; __setstate__ fills them in
+        if x is not None:
+            self.x = x
+            self.y = y
+            if normalize:
+                self.normalize()
+        return self
 
     def normalize(self):
         self.x = self.x % constants.WIDTH
@@ -80,12 +97,22 @@ class Position:
         :param direction: the direction cardinal tuple
         :return: a new position moved in that direction
         """
-        return self + Position(*direction)
+        table = _active_table
+        if table is not None:
+            try:
+                return table.offsets[direction][(self.y % table.height) * table.width + self.x % table.width]
+            except (KeyError, TypeError):
+                # Not one of the Direction tuples, e.g. a list or a longer stride
+                pass
+        return Position(self.x + direction[0], self.y + direction[1])
 
     def get_surrounding_cardinals(self):
         """
         :return: Returns a list of all positions around this specific position in each cardinal direction
         """
+        table = _active_table
+        if table is not None:
+            return list(table.neighbours[(self.y % table.height) * table.width + self.x % table.width])
         return [self.directional_offset(current_direction) for current_direction in Direction.get_all_cardinals()]
 
     def __add__(self, other):
@@ -95,22 +122,16 @@ class Position:
         return Position(self.x - other.x, self.y - other.y)
 
     def __iadd__(self, other):
-        self.x += other.x
-        self.y += other.y
-        self.normalize()
-        return self
+        return Position(self.x + other.x, self.y + other.y)
 
     def __isub__(self, other):
-        self.x -= other.x
-        self.y -= other.y
-        self.normalize()
-        return self
+        return Position(self.x - other.x, self.y - other.y)
 
     def __abs__(self):
         return Position(abs(self.x), abs(self.y))
 
     def __eq__(self, other):
-        return self.x == other.x and self.y == other.y
+        return self is other or (self.x == other.x and self.y == other.y)
 
     def __ne__(self, other):
         return not self.__eq__(other)
@@ -122,3 +143,215 @@ class Position:
 
     def __hash__(self):
         return hash((self.x, self.y))
+
+    def __reduce__(self):
+        return Position, (self.x, self.y, False)
+
+    def __setstate__(self, state):
+        # Positions pickled before __slots__ carry their coordinates as an instance dict
+        if isinstance(state, tuple):
+            state = state[1]
+        self.x = state['x']
+        self.y = state['y']
+
+
+_active_table = None
+
+
+class PositionTable:
+    """
+    Flyweight table of every normalized position on a width x height map, with each cell's neighbours.
+
+    Cells are indexed row-major: index = y * width + x.
+      positions[index]: the shared Position for that cell
+      neighbours[index]: its North, South, East and West neighbours, in Direction.get_all_cardinals() order
+      offsets[direction][index]: its neighbour in that direction (Direction.Still maps a cell to itself)
+      neighbour_indices[index]: the flat indices of its North, South, East and West neighbours
+    """
+    def __init__(self, width, height):
+        self.width = width
+        self.height = height
+        self.positions = [Position(x, y, normalize=False) for y in range(height) for x in range(width)]
+        self.offsets = {}
+        for direction in Direction.get_all_cardinals() + [Direction.Still]:
+            dx, dy = direction
+            self.offsets[direction] = [self.positions[((y + dy) % height) * width + (x + dx) % width]
+                                       for y in range(height) for x in range(width)]
+        self.neighbours = list(zip(*(self.offsets[direction] for direction in Direction.get_all_cardinals())))
+        self.neighbour_indices = [tuple(neighbour.y * width + neighbour.x for neighbour in neighbours)
+                                  for neighbours in self.neighbours]
+
+    def activate(self):
+        """
+        Makes this the table that Position construction and arithmetic intern into.
+        :return: this table
+        """
+        global _active_table
+        _active_table = self
+        return self
+
+    def index(self, position):
+        """
+        :return: The flat index of a (possibly unnormalized) position
+        """
+        return (position.y % self.height) * self.width + position.x % self.width
+
+
+def _map_dimensions():
+    """
+    :return: (width, height) of the active PositionTable's map, or of hlt.constants if no table is active
+    """
+    if _active_table is not None:
+        return _active_table.width, _active_table.height
+    return constants.WIDTH, constants.HEIGHT
+
+
+class PositionArray:
+    """
+    Many positions at once, held as two int arrays, for answering geometric questions about a whole fleet.
+
+    Operations are vectorized over the array; methods that take targets accept either a single Position
+    (compared against every element) or a PositionArray of the same length (compared element by element).
+    Map dimensions default to the active PositionTable's, falling back to hlt.constants.
+    """
+    def __init__(self, xs, ys):
+        self.xs = np.asarray(xs, dtype=np.int64)
+        self.ys = np.asarray(ys, dtype=np.int64)
+
+    @staticmethod
+    def from_positions(positions):
+        """
+        :param positions: An iterable of Positions
+        :return: A PositionArray holding them, in order
+        """
+        positions = list(positions)
+        return PositionArray([position.x for position in positions], [position.y for position in positions])
+
+    @staticmethod
+    def from_entities(entities):
+        """
+        :param entities: An iterable of ships, dropoffs or shipyards
+        :return: A PositionArray of their positions, in order
+        """
+        return PositionArray.from_positions(entity.position for entity in entities)
+
+    def __len__(self):
+        return len(self.xs)
+
+    def __getitem__(self, index):
+        """
+        :return: The Position at an integer index, or a PositionArray for a slice or index array
+        """
+        if np.ndim(index) == 0 and not isinstance(index, slice):
+            return Position(int(self.xs[index]), int(self.ys[index]))
+        return PositionArray(self.xs[index], self.ys[index])
+
+    def __iter__(self):
+        return (Position(x, y) for x, y in zip(self.xs.tolist(), self.ys.tolist()))
+
+    def __repr__(self):
+        return "{}({})".format(self.__class__.__name__, list(zip(self.xs.tolist(), self.ys.tolist())))
+
+    def normalize(self, width=None, height=None):
+        """
+        :return: A new PositionArray with every position wrapped into the bounds of the toroidal map
+        """
+        default_width, default_height = _map_dimensions()
+        return PositionArray(self.xs % (width or default_width), self.ys % (height or default_height))
+
+    def directional_offset(self, direction):
+        """
+        :param direction: A Direction cardinal tuple
+        :return: A new, normalized PositionArray with every position moved in that direction
+        """
+        return PositionArray(self.xs + direction[0], self.ys + direction[1]).normalize()
+
+    def cardinal_offsets(self):
+        """
+        :return: A list of four normalized PositionArrays, every position moved North, South, East and West,
+                 in Direction.get_all_cardinals() order
+        """
+        return [self.directional_offset(direction) for direction in Direction.get_all_cardinals()]
+
+    def indices(self, width=None):
+        """
+        :return: The flat (row-major) map index of every position. Positions must be normalized.
+        """
+        return self.ys * (width or _map_dimensions()[0]) + self.xs
+
+    @staticmethod
+    def _target_coordinates(targets):
+        if isinstance(targets, PositionArray):
+            return targets.xs, targets.ys
+        return targets.x, targets.y
+
+    def axis_distances(self, targets, wrap=True, width=None, height=None):
+        """
+        Per-axis distances between each position and its target. Positions and targets should be normalized.
+        :param targets: A Position, or a PositionArray of the same length
+        :param wrap: Whether to measure across the map edges where that is shorter
+        :return: Arrays (dx, dy) of absolute x and y distances
+        """
+        target_xs, target_ys = self._target_coordinates(targets)
+        dx = np.abs(self.xs - target_xs)
+        dy = np.abs(self.ys - target_ys)
+        if wrap:
+            default_width, default_height = _map_dimensions()
+            dx = np.minimum(dx, (width or default_width) - dx)
+            dy = np.minimum(dy, (height or default_height) - dy)
+        return dx, dy
+
+    def manhattan_distance(self, targets):
+        """
+        :param targets: A Position, or a PositionArray of the same length
+        :return: Array of Manhattan distances to the targets, ignoring wrap-around
+        """
+        dx, dy = self.axis_distances(targets, wrap=False)
+        return dx + dy
+
+    def distance(self, targets):
+        """
+        :param targets: A Position, or a PositionArray of the same length
+        :return: Array of Manhattan distances to the targets, accounting for wrap-around
+        """
+        dx, dy = self.axis_distances(targets, wrap=True)
+        return dx + dy
+
+    def distance_matrix(self, targets, wrap=True):
+        """
+        :param targets: A PositionArray of any length
+        :param wrap: Whether to account for wrap-around
+        :return: A len(self) x len(targets) array of Manhattan distances between every pair
+        """
+        dx = np.abs(self.xs[:, np.newaxis] - targets.xs[np.newaxis, :])
+        dy = np.abs(self.ys[:, np.newaxis] - targets.ys[np.newaxis, :])
+        if wrap:
+            width, height = _map_dimensions()
+            dx = np.minimum(dx, width - dx)
+            dy = np.minimum(dy, height - dy)
+        return dx + dy
+
+    def unsafe_steps(self, destinations):
+        """
+        The per-axis steps that bring each position closer to its destination, as in GameMap.get_unsafe_moves.
+        :param destinations: A Position, or a PositionArray of the same length
+        :return: Arrays (step_x, step_y), each -1, 0 or 1, where (step_x, 0) and (0, step_y) are Directions
+        """
+        width, height = _map_dimensions()
+        target_xs, target_ys = self._target_coordinates(destinations)
+        offset_x = np.asarray(target_xs) % width - self.xs % width
+        offset_y = np.asarray(target_ys) % height - self.ys % height
+        # Going the direct way is only shorter if it covers less than half the map
+        step_x = np.where(np.abs(offset_x) < width / 2, np.sign(offset_x), -np.sign(offset_x))
+        step_y = np.where(np.abs(offset_y) < height / 2, np.sign(offset_y), -np.sign(offset_y))
+        return step_x, step_y
+
+    def get_unsafe_moves(self, destinations):
+        """
+        GameMap.get_unsafe_moves for every position at once.
+        :param destinations: A Position, or a PositionArray of the same length
+        :return: A list with, for each position, the list of Directions that bring it closer to its destination
+        """
+        step_x, step_y = self.unsafe_steps(destinations)
+        return [[direction for direction in ((x, 0), (0, y)) if direction != Direction.Still]
+                for x, y in zip(step_x.tolist(), step_y.tolist())]
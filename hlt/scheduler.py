@@ -0,0 +1,112 @@
+import logging
+import threading
+import time
+
+
+class TurnScheduler:
+    """
+    Keeps each turn inside the engine's 2 second time limit.
+
+    The clock starts as soon as Game.update_frame reads a new turn number. Planning code calls checkpoint() between
+    units of work and stops early (keeping what it has) once the soft deadline passes. A watchdog thread submits the
+    best plan offered so far when the hard deadline nears: an empty command list (every ship stays still) unless the
+    bot has offered something better (FlinkBot offers a safe plan as the turn starts, then its resolved moves). Whichever of the bot and the watchdog submits first wins; the other is ignored.
+    """
+    def __init__(self, send, soft_deadline=1.4, hard_deadline=1.75, watchdog=True):
+        """
+        :param send: Function taking a list of command strings, which writes them to the engine
+        :param soft_deadline: Seconds into the turn after which checkpoint() tells planning to stop
+        :param hard_deadline: Seconds into the turn at which the watchdog submits the fallback plan
+        :param watchdog: Whether to arm the watchdog at all (not when replaying games offline)
+        """
+        self._send = send
+        self.watchdog = watchdog
+        self.soft_deadline = soft_deadline
+        self.hard_deadline = hard_deadline
+        self._lock = threading.Lock()
+        self._watchdog = None
+        self._started = None
+        self._fallback = []
+        self.turn_number = None
+        self.submitted = False
+
+    def start(self, turn_number):
+        """
+        Starts the clock for a new turn and arms the watchdog.
+        :param turn_number: The turn being planned
+        :return: nothing.
+        """
+        with self._lock:
+            self._cancel_watchdog()
+            self._started = time.perf_counter()
+            self.turn_number = turn_number
+            self._fallback = []
+            self.submitted = False
+            if not self.watchdog:
+                return
+            self._watchdog = threading.Timer(self.hard_deadline, self._on_deadline, args=(turn_number,))
+            self._watchdog.daemon = True
+            self._watchdog.start()
+
+    def elapsed(self):
+        """
+        :return: Seconds since the turn's clock started (0 if no turn has started)
+        """
+        if self._started is None:
+            return 0.0
+        return time.perf_counter() - self._started
+
+    def remaining(self):
+        """
+        :return: Seconds left before the soft deadline
+        """
+        return self.soft_deadline - self.elapsed()
+
+    def checkpoint(self, stage):
+        """
+        Called by planning code between units of work.
+        :param stage: Name of the planning stage, for the log
+        :return: True if there is time to keep going, False if the stage should stop with what it has
+        """
+        if self._started is None or self.elapsed() < self.soft_deadline:
+            return True
+        logging.warning("Turn %s: %s cut short at %.3fs", self.turn_number, stage, self.elapsed())
+        return False
+
+    def offer(self, commands):
+        """
+        Replaces the fallback plan the watchdog would submit with a better one.
+        :param commands: A complete, safe list of command strings for this turn
+        :return: nothing.
+        """
+        with self._lock:
+            self._fallback = list(commands)
+
+    def submit(self, commands):
+        """
+        Sends this turn's commands, unless they have already been sent.
+        :param commands: A list of command strings
+        :return: True if they were sent, False if the turn was already submitted (e.g. by the watchdog)
+        """
+        with self._lock:
+            if self.submitted:
+                logging.warning("Turn %s was already submitted; dropping late commands", self.turn_number)
+                return False
+            self.submitted = True
+            self._cancel_watchdog()
+            self._send(commands)
+            return True
+
+    def _on_deadline(self, turn_number):
+        with self._lock:
+            if self.submitted or turn_number != self.turn_number:
+                return
+            self.submitted = True
+            logging.warning("Turn %s hit the %.2fs deadline; submitting fallback of %s commands",
+                            turn_number, self.hard_deadline, len(self._fallback))
+            self._send(self._fallback)
+
+    def _cancel_watchdog(self):
+        if self._watchdog is not None:
+            self._watchdog.cancel()
+            self._watchdog = None
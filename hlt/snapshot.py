@@ -0,0 +1,196 @@
+"""
+Versioned game snapshots and whole-game recordings, stored as flat arrays in a .npz file.
+
+A file holds:
+    header:   JSON (format, version, constants in the engine's format, my_id, map size, and free-form metadata)
+    halite:   (height, width) halite at the start of the recording
+    players:  (players, 3) player id, shipyard x, shipyard y
+    turns:    (turns, 1 + players) turn number, then each player's stored halite, in the order of players
+    ships:    (n, 6) turn, owner, id, x, y, halite
+    dropoffs: (n, 5) turn, owner, id, x, y
+    cells:    (n, 4) turn, x, y, halite - the cells whose halite changed going into that turn
+
+Only halite is stored as deltas. Every ship and dropoff is stored in full on every turn it exists, which keeps restoring
+any turn a simple filter on the turn column at the cost of larger recordings.
+
+A snapshot is a one-turn recording whose starting halite is the map as it was on that turn. Games are restored by
+replaying the arrays through the engine protocol into hlt.Game, so a restored game is exactly what the bot would have
+read from the engine.
+"""
+import io
+import json
+
+import numpy as np
+
+from . import constants
+from .common import FrameReader
+from .networking import Game
+
+FORMAT = "halite-snapshot"
+VERSION = 1
+
+
+class GameRecorder:
+    """
+    Captures a game turn by turn. Create it before the first Game.update_frame (or at any later frame, to start
+    the recording there) and subscribe record_frame to the game: game.subscribe(recorder.record_frame).
+    """
+    def __init__(self, game):
+        self.game = game
+        self.my_id = game.my_id
+        self.constants = constants.dump_constants()
+        self.halite = game.game_map.halite.copy()
+        self.players = [(player.id, player.shipyard.position.x, player.shipyard.position.y)
+                        for player in game.players.values()]
+        self.turns = []
+        self.ships = []
+        self.dropoffs = []
+        self.cells = []
+
+    def record_frame(self, changes=None):
+        """
+        Records the game's current frame.
+        :param changes: The frame's MapChanges, whose changed cells are recorded. None records no halite changes.
+        :return: nothing.
+        """
+        game = self.game
+        turn = game.turn_number
+        self.turns.append([turn] + [game.players[player_id].halite_amount for player_id, _, _ in self.players])
+        for player_id, _, _ in self.players:
+            player = game.players[player_id]
+            for ship in player.get_ships():
+                self.ships.append((turn, player_id, ship.id, ship.position.x, ship.position.y, ship.halite_amount))
+            for dropoff in player.get_dropoffs():
+                self.dropoffs.append((turn, player_id, dropoff.id, dropoff.position.x, dropoff.position.y))
+        if changes is not None and changes.halite_cells:
+            width = game.game_map.width
+            halite = game.game_map.halite.ravel()
+            for index in changes.halite_cells:
+                y, x = divmod(index, width)
+                self.cells.append((turn, x, y, int(halite[index])))
+
+    def save(self, filename, metadata=None):
+        """
+        Writes the recording.
+        :param filename: Where to write the .npz file
+        :param metadata: JSON-serializable data to store in the header (e.g. the bot's parameters)
+        :return: nothing.
+        """
+        height, width = self.halite.shape
+        header = {"format": FORMAT, "version": VERSION, "constants": self.constants, "my_id": self.my_id,
+                  "width": width, "height": height, "metadata": metadata or {}}
+        with open(filename, "wb") as snapshot_file:
+            np.savez_compressed(
+                snapshot_file,
+                header=np.array(json.dumps(header)),
+                halite=self.halite.astype(np.int32),
+                players=np.array(self.players, dtype=np.int32).reshape(-1, 3),
+                turns=np.array(self.turns, dtype=np.int32).reshape(-1, 1 + len(self.players)),
+                ships=np.array(self.ships, dtype=np.int32).reshape(-1, 6),
+                dropoffs=np.array(self.dropoffs, dtype=np.int32).reshape(-1, 5),
+                cells=np.array(self.cells, dtype=np.int32).reshape(-1, 4),
+            )
+
+
+def save_snapshot(game, filename, metadata=None):
+    """
+    Writes the game's current frame as a snapshot.
+    :param game: The game to save
+    :param filename: Where to write the .npz file
+    :param metadata: JSON-serializable data to store in the header
+    :return: nothing.
+    """
+    recorder = GameRecorder(game)
+    recorder.record_frame()
+    recorder.save(filename, metadata)
+
+
+def read_header(filename):
+    """
+    :return: The header of a snapshot or recording, as a dict
+    """
+    with np.load(filename) as data:
+        return _check_header(json.loads(str(data["header"])))
+
+
+def _check_header(header):
+    if header.get("format") != FORMAT:
+        raise ValueError("Not a game snapshot")
+    if header.get("version", 0) > VERSION:
+        raise ValueError("Snapshot version {} is newer than this reader ({})".format(header["version"], VERSION))
+    return header
+
+
+def _rows_by_turn(rows):
+    """
+    :return: {turn: rows for that turn}, for arrays whose first column is the turn
+    """
+    if not len(rows):
+        return {}
+    turns, starts = np.unique(rows[:, 0], return_index=True)
+    ends = list(starts[1:]) + [len(rows)]
+    return {int(turn): rows[start:end, 1:] for turn, start, end in zip(turns, starts, ends)}
+
+
+def _protocol(header, data):
+    """
+    Renders a recording as the text the engine would have sent.
+    """
+    halite = data["halite"]
+    players = data["players"]
+    lines = [json.dumps(header["constants"]), "{} {}".format(len(players), header["my_id"])]
+    lines.extend("{} {} {}".format(*player) for player in players.tolist())
+    lines.append("{} {}".format(header["width"], header["height"]))
+    lines.extend(" ".join(map(str, row)) for row in halite.tolist())
+
+    ships = _rows_by_turn(data["ships"])
+    dropoffs = _rows_by_turn(data["dropoffs"])
+    cells = _rows_by_turn(data["cells"])
+    empty = np.zeros((0, 5), dtype=np.int32)
+    for turn_row in data["turns"].tolist():
+        turn = turn_row[0]
+        lines.append(str(turn))
+        turn_ships = ships.get(turn, empty)
+        turn_dropoffs = dropoffs.get(turn, empty)
+        for (player_id, _, _), player_halite in zip(players.tolist(), turn_row[1:]):
+            own_ships = turn_ships[turn_ships[:, 0] == player_id, 1:].tolist()
+            own_dropoffs = turn_dropoffs[turn_dropoffs[:, 0] == player_id, 1:4].tolist()
+            lines.append("{} {} {} {}".format(player_id, len(own_ships), len(own_dropoffs), player_halite))
+            lines.extend("{} {} {} {}".format(*ship) for ship in own_ships)
+            lines.extend("{} {} {}".format(*dropoff) for dropoff in own_dropoffs)
+        turn_cells = cells.get(turn, empty[:, :3]).tolist()
+        lines.append(str(len(turn_cells)))
+        lines.extend("{} {} {}".format(*cell) for cell in turn_cells)
+    return ("\n".join(lines) + "\n").encode()
+
+
+def replay(filename):
+    """
+    Steps through a recording.
+    :param filename: A file written by GameRecorder.save or save_snapshot
+    :return: A generator yielding the same offline hlt.Game after each recorded turn (hlt.constants are loaded too)
+    """
+    with np.load(filename) as data:
+        header = _check_header(json.loads(str(data["header"])))
+        turns = len(data["turns"])
+        text = _protocol(header, data)
+    game = Game(reader=FrameReader(io.BufferedReader(io.BytesIO(text))))
+    for _ in range(turns):
+        game.update_frame()
+        yield game
+
+
+def load_game(filename, turn=None):
+    """
+    Restores one frame of a snapshot or recording.
+    :param filename: A file written by GameRecorder.save or save_snapshot
+    :param turn: The turn to restore. The last recorded turn if omitted.
+    :return: (game, metadata) where game is an offline hlt.Game and metadata is the header's metadata
+    """
+    game = None
+    for game in replay(filename):
+        if game.turn_number == turn:
+            break
+    if game is None or (turn is not None and game.turn_number != turn):
+        raise ValueError("Turn {} is not in {}".format(turn, filename))
+    return game, read_header(filename)["metadata"]
@@ -0,0 +1,144 @@
+"""
+Per-game telemetry: an append-only JSON-lines file of typed records, and a reader that loads it into NumPy arrays.
+
+Every line is one JSON object with a "type":
+    game:      {"version", "player", "seed", "width", "height", "params"} - always the first record
+    map:       {"halite": [[...], ...]} - the starting halite, one row per y
+    turn:      {"turn", "halite", "ships", "dropoffs", "timing": {phase: seconds}}
+    collision: {"turn", "ship", "x", "y"} - one of the player's ships was destroyed without becoming a dropoff
+"""
+import atexit
+import json
+from collections import namedtuple
+
+import numpy as np
+
+VERSION = 1
+
+
+class TelemetryWriter:
+    """
+    Writes one game's telemetry records. The file is buffered and closed (flushed) at exit.
+    """
+    def __init__(self, filename):
+        self._file = open(filename, "w")
+        atexit.register(self.close)
+
+    def _write(self, record_type, **fields):
+        fields["type"] = record_type
+        self._file.write(json.dumps(fields, separators=(",", ":")))
+        self._file.write("\n")
+
+    def game(self, player, seed, width, height, params=()):
+        """
+        Writes the game record.
+        :param player: The bot's player id
+        :param seed: The engine's map seed (None if unknown)
+        :param params: The bot's personality parameters
+        :return: nothing.
+        """
+        self._write("game", version=VERSION, player=player, seed=seed, width=width, height=height, params=list(params))
+
+    def map(self, halite):
+        """
+        Writes the starting map.
+        :param halite: An (height, width) array of halite
+        :return: nothing.
+        """
+        self._write("map", halite=np.asarray(halite).tolist())
+
+    def turn(self, turn_number, halite, ships, dropoffs, timing=None):
+        """
+        Writes one turn's summary.
+        :param halite: The player's stored halite at the start of the turn
+        :param ships: How many ships the player has
+        :param dropoffs: How many dropoffs the player has
+        :param timing: {phase name: seconds} spent on the turn
+        :return: nothing.
+        """
+        self._write("turn", turn=turn_number, halite=halite, ships=ships, dropoffs=dropoffs, timing=timing or {})
+
+    def collision(self, turn_number, ship_id, position):
+        """
+        Writes that one of the player's ships was destroyed.
+        :return: nothing.
+        """
+        self._write("collision", turn=turn_number, ship=ship_id, x=position.x, y=position.y)
+
+    def close(self):
+        """
+        Flushes and closes the file. Safe to call more than once.
+        :return: nothing.
+        """
+        if not self._file.closed:
+            self._file.close()
+
+
+GameTelemetry = namedtuple('GameTelemetry', ['info', 'map', 'turns', 'halite', 'ships', 'dropoffs', 'timing', 'collisions'])
+GameTelemetry.__doc__ = """
+One game's telemetry as arrays.
+
+info: the game record (dict). map: (height, width) int array, or None.
+turns, halite, ships, dropoffs: int arrays with one entry per turn record.
+timing: {phase: float array per turn, NaN where a turn did not record the phase}.
+collisions: (n, 4) int array of turn, ship id, x, y.
+"""
+
+
+def read_game(filename):
+    """
+    Loads one telemetry file.
+    :param filename: A file written by TelemetryWriter
+    :return: A GameTelemetry
+    """
+    info = {}
+    game_map = None
+    turns = []
+    timings = []
+    collisions = []
+    with open(filename) as telemetry_file:
+        for line in telemetry_file:
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            record_type = record.pop("type")
+            if record_type == "turn":
+                turns.append((record["turn"], record["halite"], record["ships"], record["dropoffs"]))
+                timings.append(record["timing"])
+            elif record_type == "collision":
+                collisions.append((record["turn"], record["ship"], record["x"], record["y"]))
+            elif record_type == "map":
+                game_map = np.array(record["halite"], dtype=np.int32)
+            elif record_type == "game":
+                info = record
+
+    columns = np.array(turns, dtype=np.int64).reshape(-1, 4)
+    phases = sorted({phase for timing in timings for phase in timing})
+    timing = {phase: np.array([timing.get(phase, np.nan) for timing in timings], dtype=float) for phase in phases}
+    return GameTelemetry(info, game_map, columns[:, 0], columns[:, 1], columns[:, 2], columns[:, 3], timing,
+                         np.array(collisions, dtype=np.int64).reshape(-1, 4))
+
+
+def iter_games(filenames):
+    """
+    Streams games one at a time, so many games never have to be held as text at once.
+    :param filenames: Telemetry files
+    :return: A generator of GameTelemetry
+    """
+    for filename in filenames:
+        yield read_game(filename)
+
+
+def stack(games, field):
+    """
+    Lines up one per-turn field across games.
+    :param games: An iterable of GameTelemetry
+    :param field: 'halite', 'ships' or 'dropoffs', or a timing phase name
+    :return: A (games, turns) float array, padded with NaN where a game has fewer turns
+    """
+    rows = [getattr(game, field) if field in GameTelemetry._fields else game.timing.get(field, np.array([]))
+            for game in games]
+    result = np.full((len(rows), max((len(row) for row in rows), default=0)), np.nan)
+    for i, row in enumerate(rows):
+        result[i, :len(row)] = row
+    return result